@@ -0,0 +1,128 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from attack_tables import bishop_attacks, queen_attacks, rook_attacks
+from bitboard import Bitboards, square_index
+from board_state import BoardState
+from chess_move import ChessMove
+from fen import FEN
+from move_generator import MoveGenerator
+from perft import SUITE
+from piece import Piece
+
+def bitboards_match_board(board_state):
+    expected = Bitboards()
+    expected.load_from_board(board_state.board)
+    return expected.pieces == board_state.bitboards.pieces and expected.occupied == board_state.bitboards.occupied
+
+def piece_lists_match_board(board_state):
+    for color in (Piece.White, Piece.Black):
+        expected = {(square >> 3, square & 7): piece for square, piece in enumerate(board_state.board)
+                    if piece != Piece.No_Piece and Piece.get_piece_color(piece) == color}
+        if board_state.piece_positions[color] != expected:
+            return False
+        king = [position for position, piece in expected.items() if Piece.is_king(piece)]
+        if board_state.get_king_position(color) != king[0]:
+            return False
+    return True
+
+def move_keys(moves):
+    return sorted((move.start, move.end) for move in moves)
+
+class TestBitboardBackend(unittest.TestCase):
+
+    def test_same_moves_as_mailbox_backend(self):
+        move_generator = MoveGenerator()
+        fen = FEN()
+        for name, position, _ in SUITE:
+            bitboard_state = BoardState()
+            mailbox_state = BoardState(use_bitboards=False)
+            self.assertIsNone(mailbox_state.bitboards)
+            fen.fen_to_board_state(position, bitboard_state)
+            fen.fen_to_board_state(position, mailbox_state)
+            moves = move_generator.generate_legal_moves(bitboard_state)
+            self.assertEqual(move_keys(moves), move_keys(move_generator.generate_legal_moves(mailbox_state)), name)
+            # And the replies to each of them, king moves out of check and into pins show up there
+            for move in moves:
+                bitboard_state.make_move(move, detect_game_over=False)
+                mailbox_state.make_move(move, detect_game_over=False)
+                self.assertEqual(move_keys(move_generator.generate_legal_moves(bitboard_state)),
+                                 move_keys(move_generator.generate_legal_moves(mailbox_state)), (name, str(move)))
+                bitboard_state.undo_last_move()
+                mailbox_state.undo_last_move()
+
+    def test_side_without_king(self):
+        # Hand made positions may leave a king out, en passant then has no king to expose on either backend
+        move_generator = MoveGenerator()
+        moves = []
+        for use_bitboards in (True, False):
+            board_state = BoardState(use_bitboards=use_bitboards)
+            FEN().fen_to_board_state("4k3/8/8/3Pp3/8/8/8/8 w - e6 0 1", board_state)
+            moves.append(move_keys(move_generator.generate_legal_moves(board_state)))
+        self.assertEqual(moves[0], [((3, 3), (2, 3)), ((3, 3), (2, 4))])
+        self.assertEqual(moves[0], moves[1])
+
+    def test_castling_en_passant_and_promotion_stay_in_sync(self):
+        board_state = BoardState()
+        FEN().fen_to_board_state("r3k2r/1P6/8/8/5p2/8/4P3/R3K2R w KQkq - 0 1", board_state)
+        moves = [
+            ChessMove(Piece.WhitePawn, (6, 4), (4, 4)),    # e2e4, allows f4xe3 en passant
+            ChessMove(Piece.BlackPawn, (4, 5), (5, 4)),    # f4xe3 en passant
+            ChessMove(Piece.WhiteKing, (7, 4), (7, 6)),    # white castles kingside
+            ChessMove(Piece.BlackKing, (0, 4), (0, 2)),    # black castles queenside
+            ChessMove(Piece.WhitePawn, (1, 1), (0, 1)),    # b7b8 promotes to a queen
+        ]
+        for move in moves:
+            board_state.make_move(move)
+            self.assertTrue(bitboards_match_board(board_state), move)
+            self.assertTrue(piece_lists_match_board(board_state), move)
+        self.assertEqual(board_state.board[4 * 8 + 5], Piece.No_Piece)
+        self.assertEqual(board_state.board[0 * 8 + 1], Piece.WhiteQueen)
+
+        for _ in moves:
+            board_state.undo_last_move()
+            self.assertTrue(bitboards_match_board(board_state))
+            self.assertTrue(piece_lists_match_board(board_state))
+        self.assertEqual(board_state.board[4 * 8 + 5], Piece.BlackPawn)
+        self.assertEqual(board_state.board[1 * 8 + 1], Piece.WhitePawn)
+
+    def test_slider_attack_tables(self):
+        a1 = square_index(7, 0)
+        a4 = square_index(4, 0)
+        c1 = square_index(7, 2)
+        occupied = (1 << a4) | (1 << c1)
+        expected = (1 << square_index(6, 0)) | (1 << square_index(5, 0)) | (1 << a4) | (1 << square_index(7, 1)) | (1 << c1)
+        self.assertEqual(rook_attacks(a1, occupied), expected)
+        # Blockers on the edge of the board do not change the attack set
+        self.assertEqual(bishop_attacks(a1, 0), bishop_attacks(a1, 1 << square_index(0, 7)))
+        self.assertEqual(queen_attacks(a1, occupied), expected | bishop_attacks(a1, occupied))
+
+    def test_perft_position_2(self):
+        board_state = BoardState()
+        FEN().fen_to_board_state(FEN.fen_position_2, board_state)
+        move_generator = MoveGenerator()
+        nodes = 0
+        for move in move_generator.generate_legal_moves(board_state):
+            board_state.make_move(move)
+            nodes += len(move_generator.generate_legal_moves(board_state))
+            board_state.undo_last_move()
+        self.assertEqual(nodes, 2039)
+
+    def test_captures_only_generation(self):
+        board_state = BoardState()
+        FEN().fen_to_board_state("r3k2r/pP1pqpb1/bn2pnp1/3PN3/4P3/2N2Q2/PPPBBPpP/R3K2R w KQkq - 0 1", board_state)
+        move_generator = MoveGenerator()
+        for move in move_generator.generate_legal_moves(board_state):
+            board_state.make_move(move)
+            all_moves = move_generator.generate_legal_moves(board_state)
+            # Captures and queen promotions, underpromotions are left to the full search
+            expected = [reply for reply in all_moves if reply.promotion & 7 in (Piece.No_Piece, Piece.Queen)
+                        and (reply.captured_piece != Piece.No_Piece or (Piece.is_pawn(reply.piece) and reply.end[0] in (0, 7)))]
+            self.assertEqual(move_keys(move_generator.get_capture_moves(board_state)), move_keys(expected))
+            board_state.undo_last_move()
+
+
+if __name__ == '__main__':
+    unittest.main()
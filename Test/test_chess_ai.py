@@ -0,0 +1,205 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import unittest
+import numpy as np
+from background_search import BackgroundSearch
+from board_evaluator import board_array, random_positions
+from board_state import BoardState
+from chess_ai import ChessAI
+from chess_move import ChessMove, move_buffers
+from fen import FEN
+from move_generator import MoveGenerator
+from move_ordering import MoveOrderer
+from parallel_search import ParallelSearch
+from piece import Piece
+from transposition_table import pack_move
+
+class TestChessAI(unittest.TestCase):
+
+    def test_iterative_deepening_respects_movetime(self):
+        board_state = BoardState()
+        start_hash = board_state.zobrist_hash
+        ai = ChessAI(20)
+        start = time.perf_counter()
+        score, move = ai.search(board_state, movetime=0.4)
+        elapsed = time.perf_counter() - start
+
+        self.assertIsNotNone(move)
+        self.assertLess(elapsed, 0.4 + 0.25)
+        # The aborted iteration is unwound and the result comes from the last completed one
+        self.assertEqual(board_state.zobrist_hash, start_hash)
+        self.assertEqual(len(board_state.move_history), 0)
+        self.assertLess(ai.iterations[-1]['depth'], 20)
+        self.assertEqual(score, ai.iterations[-1]['score'])
+        self.assertEqual((move.start, move.end), (ai.pv[0].start, ai.pv[0].end))
+
+    def test_quiescence_sees_recapture(self):
+        board_state = BoardState()
+        # Qxe5 wins a pawn at depth one, but d6xe5 wins the queen back
+        FEN().fen_to_board_state("4k3/8/3p4/4p3/8/8/8/4QK2 w - - 0 1", board_state)
+        ai = ChessAI(1)
+        score, move = ai.choose_best_move(board_state, Piece.White)
+        self.assertNotEqual(move.end, (3, 4))
+        self.assertGreater(ai.quiescence_nodes, 0)
+        self.assertEqual(ai.evaluator.evaluate(board_state, Piece.White), -ai.evaluator.evaluate(board_state, Piece.Black))
+
+    def test_tapered_evaluation(self):
+        evaluator = ChessAI(1).evaluator
+        board_state = BoardState()
+        self.assertEqual(board_state.phase, evaluator.PHASE_TOTAL)
+        self.assertEqual(evaluator.evaluate(board_state, Piece.White), 0)
+        # Bare kings and a pawn are a pure endgame, the centralised king scores its endgame table bonus
+        FEN().fen_to_board_state("4k3/8/8/8/3K4/8/4P3/8 w - - 0 1", board_state)
+        self.assertEqual(board_state.phase, 0)
+        self.assertEqual(evaluator.evaluate(board_state, Piece.White), board_state.endgame_score)
+        board_state.debug_hash = True
+        board_state.make_move(ChessMove(Piece.WhitePawn, (6, 4), (4, 4)))
+        board_state.undo_last_move()
+
+    def test_batch_evaluation_matches_scalar(self):
+        evaluator = ChessAI(1).evaluator
+        boards, colors = random_positions(300, seed=3)
+        expected = []
+        for fen in (FEN.standard_game, FEN.fen_position_3, FEN.fen_position_4_2, "4k3/8/8/8/3K4/8/4P3/8 w - - 0 1"):
+            board_state = BoardState()
+            FEN().fen_to_board_state(fen, board_state)
+            boards = np.vstack([boards, board_array(board_state)])
+            colors = np.append(colors, Piece.Black)
+        board_state = BoardState()
+        for board, color in zip(boards, colors):
+            board_state.board[:] = board.tobytes()
+            board_state.rebuild_from_board()
+            expected.append(evaluator.evaluate(board_state, int(color)))
+        self.assertEqual(evaluator.evaluate_batch(boards, colors).tolist(), expected)
+
+    def test_finds_mate_in_one(self):
+        board_state = BoardState()
+        FEN().fen_to_board_state("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", board_state)
+        score, move = ChessAI(3).choose_best_move(board_state, Piece.White)
+        self.assertEqual(score, ChessAI.MATE_SCORE - 1)
+        self.assertEqual(move.end, (0, 0))
+
+    def test_pruning_saves_nodes(self):
+        italian = "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"
+        nodes = []
+        for pruning in (False, True):
+            board_state = BoardState()
+            FEN().fen_to_board_state(italian, board_state)
+            ai = ChessAI(4)
+            ai.use_null_move = ai.use_late_move_reductions = pruning
+            ai.search(board_state)
+            nodes.append(ai.iterations[-1]['nodes'])
+            self.assertEqual(sum(ai.iterations[-1]['nodes_per_ply']) + ai.iterations[-1]['quiescence_nodes'], nodes[-1])
+            # Cutoff rates are counted per iteration too, the root orders its moves once
+            self.assertEqual(ai.iterations[-1]['cutoff_stats'][0]['nodes'], 1)
+        self.assertLess(nodes[1], nodes[0])
+
+    def test_null_move_is_undone(self):
+        board_state = BoardState()
+        FEN().fen_to_board_state("4k3/3p4/8/4P3/8/8/8/4K3 b - - 0 1", board_state)
+        board_state.make_move(ChessMove(Piece.BlackPawn, (1, 3), (3, 3)))
+        start_hash = board_state.zobrist_hash
+        board_state.make_null_move()
+        self.assertEqual(board_state.current_player_color, Piece.Black)
+        self.assertIsNone(board_state.en_passant_square)
+        board_state.debug_hash = True
+        board_state.undo_last_move()
+        self.assertEqual(board_state.zobrist_hash, start_hash)
+        self.assertEqual(board_state.en_passant_square, (2, 3))
+        self.assertEqual(board_state.current_player_color, Piece.White)
+
+    def test_parallel_root_search_matches_single_process(self):
+        board_state = BoardState()
+        FEN().fen_to_board_state("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1", board_state)
+        expected = ChessAI(3).search(board_state)
+        search = ParallelSearch(3, workers=2)
+        try:
+            score, move = search.search(board_state)
+        finally:
+            search.close()
+        self.assertEqual(score, expected[0])
+        self.assertEqual((move.start, move.end), (expected[1].start, expected[1].end))
+        self.assertEqual([info['depth'] for info in search.iterations], [1, 2, 3])
+
+    def test_background_search_and_ponder_hit(self):
+        board_state = BoardState()
+        start_hash = board_state.zobrist_hash
+        search = BackgroundSearch(20, 0.3)
+        try:
+            search.start(board_state)
+            self.assertIsNone(search.poll())
+            result = None
+            while result is None:
+                time.sleep(0.01)
+                result = search.poll()
+            self.assertEqual(board_state.zobrist_hash, start_hash)
+
+            board_state.make_move(result[1])
+            reply = search.pv[1]
+            search.ponder(board_state, reply)
+            time.sleep(0.2)
+            # Still pondering, nothing to play yet
+            self.assertIsNone(search.poll())
+            board_state.make_move(reply)
+            search.opponent_moved(reply, board_state)
+            start = time.perf_counter()
+            result = None
+            while result is None:
+                time.sleep(0.01)
+                result = search.poll()
+            self.assertLess(time.perf_counter() - start, 0.3 + 0.5)
+            self.assertIn((result[1].start, result[1].end), [(move.start, move.end) for move in MoveGenerator().get_all_moves(board_state)])
+        finally:
+            search.close()
+
+    def test_ponder_hit_on_promotion(self):
+        board_state = BoardState()
+        FEN().fen_to_board_state("7k/P7/8/8/8/8/8/K7 w - - 0 1", board_state)
+        reply = next(move for move in MoveGenerator().get_all_moves(board_state) if move.promotion == Piece.WhiteQueen)
+        search = BackgroundSearch(20, 0.3)
+        try:
+            search.ponder(board_state, reply)
+            # Played on the board the move does not name its promotion, it still is the reply pondered on
+            played = ChessMove(Piece.WhitePawn, (1, 0), (0, 0))
+            board_state.make_move(played)
+            search.opponent_moved(played, board_state)
+            self.assertFalse(search.pondering)
+            self.assertIsNotNone(search.stop_at)
+        finally:
+            search.close()
+
+    def test_clock_allocation(self):
+        ai = ChessAI(4)
+        self.assertEqual(ai.allocate_time(movetime=2.5), 2.5)
+        self.assertAlmostEqual(ai.allocate_time(clock=60, increment=2), 60 / 30 + 1.5)
+        self.assertAlmostEqual(ai.allocate_time(clock=1, increment=10), 1 - ai.clock_margin)
+        self.assertIsNone(ai.allocate_time())
+
+    def test_move_ordering(self):
+        board_state = BoardState()
+        FEN().fen_to_board_state(FEN.fen_position_2, board_state)
+        buffer = move_buffers(1)[0]
+        count = MoveGenerator().get_packed_moves(board_state, Piece.White, buffer)
+        moves = [ChessMove.from_packed(code) for code in buffer[:count]]
+        self.assertEqual([move.pack() for move in moves], buffer[:count])
+        orderer = MoveOrderer()
+        orderer.record_node(3)
+        quiet = next(move.pack() for move in moves if move.captured_piece == Piece.No_Piece and move.piece & 7 == Piece.Knight)
+        orderer.record_cutoff(quiet, 3, 2, 0)
+        hash_move = next(move for move in moves if move.piece & 7 == Piece.King)
+        ordered = [ChessMove.from_packed(code) for code in orderer.order_moves(buffer, count, 3, pack_move(hash_move))]
+
+        self.assertEqual(ordered[0].pack(), hash_move.pack())
+        # Captures follow by victim, then cheapest attacker, ahead of the killer
+        captures = [move for move in ordered[1:] if move.captured_piece != Piece.No_Piece]
+        self.assertEqual(ordered[1:len(captures) + 1], captures)
+        victims = [(move.captured_piece & 7, -(move.piece & 7)) for move in captures]
+        self.assertEqual(victims, sorted(victims, reverse=True))
+        self.assertEqual(ordered[len(captures) + 1].pack(), quiet)
+        self.assertEqual(orderer.cutoff_stats()[3]['cutoff_rate'], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
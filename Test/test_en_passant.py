@@ -14,8 +14,8 @@ class TestEnPassant(unittest.TestCase):
         # Set up the board state with a custom configuration
         board_state = BoardState()
         # Manually place pieces to create the scenario for en passant
-        board_state.board[1][3] = Piece.BlackPawn  # Place a black pawn at (1, 3)
-        board_state.board[6][3] = Piece.WhitePawn  # Place a white pawn at (6, 3)
+        board_state.board[1 * 8 + 3] = Piece.BlackPawn  # Place a black pawn at (1, 3)
+        board_state.board[6 * 8 + 3] = Piece.WhitePawn  # Place a white pawn at (6, 3)
 
         # List of legal moves for en passant
         moves = [
@@ -31,8 +31,8 @@ class TestEnPassant(unittest.TestCase):
             board_state.make_move(move)
 
         # Check that the en passant capture was performed correctly
-        self.assertEqual(board_state.board[2][2], Piece.WhitePawn)  # Check that the white pawn captured en passant
-        self.assertEqual(board_state.board[3][2], Piece.No_Piece)   # Check that the black pawn is no longer on the board
+        self.assertEqual(board_state.board[2 * 8 + 2], Piece.WhitePawn)  # Check that the white pawn captured en passant
+        self.assertEqual(board_state.board[3 * 8 + 2], Piece.No_Piece)   # Check that the black pawn is no longer on the board
 
 
 if __name__ == '__main__':
@@ -0,0 +1,43 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from board_state import BoardState
+from chess_move import ChessMove
+from fen import FEN, parse_fen, random_fens
+from piece import Piece
+
+class TestFEN(unittest.TestCase):
+
+    def test_round_trip(self):
+        fen = FEN()
+        for text in random_fens(300, seed=5) + [FEN.standard_game, FEN.fen_position_5, FEN.fen_position_6]:
+            board_state = BoardState()
+            fen.fen_to_board_state(text, board_state)
+            self.assertEqual(fen.board_state_to_fen(board_state), text)
+
+    def test_en_passant_and_halfmove_clock_are_kept(self):
+        played = BoardState()
+        for move in (ChessMove(Piece.WhiteKnight, (7, 6), (5, 5)), ChessMove(Piece.BlackKnight, (0, 6), (2, 5)),
+                     ChessMove(Piece.WhitePawn, (6, 4), (4, 4))):
+            played.make_move(move)
+        text = FEN().board_state_to_fen(played)
+        self.assertEqual(text, "rnbqkb1r/pppppppp/5n2/8/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq e3 0 2")
+
+        loaded = BoardState()
+        loaded.halfmove_clock = 7
+        FEN().fen_to_board_state(text, loaded)
+        self.assertEqual(loaded.en_passant_square, (5, 4))
+        self.assertEqual(loaded.halfmove_clock, 0)
+        # Same position, same key, so a cached parse is as good as playing the moves
+        self.assertEqual(loaded.zobrist_hash, played.zobrist_hash)
+        self.assertIs(parse_fen(text), parse_fen(text))
+
+    def test_bad_placement(self):
+        for text in ("rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1", "rnbqkbnr/ppppxppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1", ""):
+            with self.assertRaises(ValueError):
+                parse_fen(text)
+
+if __name__ == '__main__':
+    unittest.main()
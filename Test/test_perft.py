@@ -0,0 +1,42 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from board_state import BoardState
+from fen import FEN
+from perft import SUITE, PerftTable, _init_worker, divide, parallel_divide, perft
+
+class TestPerft(unittest.TestCase):
+
+    def test_suite_positions(self):
+        for name, fen, counts in SUITE:
+            board_state = BoardState()
+            FEN().fen_to_board_state(fen, board_state)
+            # Depth 3 reaches the underpromotions of position 4
+            for depth in (1, 2, 3) if name == 'position 4' else (1, 2):
+                self.assertEqual(perft(board_state, depth), counts[depth - 1], f"{name} depth {depth}")
+            self.assertEqual(len(board_state.move_history), 0)
+
+    def test_divide(self):
+        counts = divide(BoardState(), 2)
+        self.assertEqual(len(counts), 20)
+        self.assertEqual(counts['e2e4'], 20)
+        self.assertEqual(sum(counts.values()), 400)
+
+    def test_parallel_and_hashed_counts_match(self):
+        board_state = BoardState()
+        FEN().fen_to_board_state(FEN.fen_position_2, board_state)
+        expected = divide(board_state, 3)
+        table = PerftTable(1)
+        self.assertEqual(perft(board_state, 3, table), sum(expected.values()))
+        self.assertEqual(perft(board_state, 3, table), sum(expected.values()))
+        self.assertGreater(table.hits, 0)
+        with ProcessPoolExecutor(2, initializer=_init_worker, initargs=(1,)) as executor:
+            counts, workers = parallel_divide(executor, board_state, 3)
+        self.assertEqual(counts, expected)
+        self.assertEqual(sum(worker['moves'] for worker in workers), len(expected))
+
+if __name__ == '__main__':
+    unittest.main()
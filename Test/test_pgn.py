@@ -0,0 +1,89 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import unittest
+from board_state import BoardState
+from fen import FEN
+from pgn import PGNError, move_to_san, parse_san, random_games, read_games, replay_games, san_moves
+
+ANNOTATED = """[Event "Annotated"]
+[White "A \\"quoted\\" name"]
+
+1. e4 {best by test} e5 2. Nf3 (2. f4 exf4 {the
+gambit}) 2... Nc6 $1 3. Bb5 a6 ; the Morphy defence
+4. Ba4 Nf6 5. O-O Be7!? 1/2-1/2
+
+[Event "Promotion"]
+[SetUp "1"]
+[FEN "8/P7/8/8/8/8/k6p/4K3 w - - 0 1"]
+
+1. a8=Q+ Kb2 2. Qh1 *
+
+[Event "Illegal"]
+
+1. e4 e5 2. Ke3 *
+
+[Event "Back to the start"]
+
+1. d4 d5 *
+"""
+
+class TestPGN(unittest.TestCase):
+
+    def test_annotated_games(self):
+        self.assertEqual([tags['Event'] for tags, _ in read_games(io.StringIO(ANNOTATED))],
+                         ['Annotated', 'Promotion', 'Illegal', 'Back to the start'])
+        board_state = BoardState()
+        fen = FEN()
+        errors = []
+        played = {}
+        for number, tags, ply, move in replay_games(io.StringIO(ANNOTATED), board_state, errors):
+            board_state.undo_last_move()
+            played.setdefault(number, []).append(move_to_san(board_state, move))
+            board_state.execute_packed_move(move)
+        self.assertEqual(played[1], ['e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6', 'Ba4', 'Nf6', 'O-O', 'Be7'])
+        self.assertEqual(played[2], ['a8=Q+', 'Kb2', 'Qh1'])
+        # The illegal game gives the moves before the bad one, then is dropped
+        self.assertEqual(played[3], ['e4', 'e5'])
+        self.assertEqual([(number, str(error)) for number, _, error in errors], [(3, "Illegal move Ke3")])
+        self.assertEqual(played[4], ['d4', 'd5'])
+        self.assertEqual(fen.board_state_to_fen(board_state), FEN.standard_game)
+
+    def test_comments_spanning_lines(self):
+        text = """[Event "a"]
+
+1. e4 {a comment that does not
+end} e5 {again
+[see note] more} 2. Nf3 *
+
+[Event "b"]
+
+1. d4 ; a {brace
+1... d5 *
+
+[Event "c"]
+
+1. c4 *
+"""
+        games = list(read_games(io.StringIO(text)))
+        self.assertEqual([tags['Event'] for tags, _ in games], ['a', 'b', 'c'])
+        self.assertEqual([list(san_moves(movetext)) for _, movetext in games], [['e4', 'e5', 'Nf3'], ['d4', 'd5'], ['c4']])
+
+    def test_random_games_round_trip(self):
+        text = random_games(20, seed=3)
+        board_state = BoardState()
+        plies = sum(1 for _ in replay_games(io.StringIO(text), board_state))
+        self.assertGreater(plies, 20)
+        self.assertEqual(board_state.move_history, [])
+
+    def test_ambiguous_move(self):
+        board_state = BoardState()
+        FEN().fen_to_board_state("4k3/8/8/8/8/8/4K3/R6R w - - 0 1", board_state)
+        with self.assertRaises(PGNError):
+            parse_san(board_state, 'Rd1')
+        self.assertEqual(move_to_san(board_state, parse_san(board_state, 'Rad1')), 'Rad1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import subprocess
+import unittest
+from parallel_search import STARTUP_BUDGET, measure_startup
+
+class TestStartup(unittest.TestCase):
+
+    def test_worker_starts_headless_within_budget(self):
+        seconds, modules = measure_startup()
+        self.assertEqual(modules, [])
+        self.assertLess(seconds, STARTUP_BUDGET)
+
+    def test_ui_module_imports_without_pygame(self):
+        # pygame only loads once a Chess window is made
+        result = subprocess.run([sys.executable, '-c', "import sys, chess; print('pygame' in sys.modules)"],
+                                cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')),
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), 'False')
+
+if __name__ == '__main__':
+    unittest.main()
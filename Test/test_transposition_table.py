@@ -0,0 +1,46 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from board_state import BoardState
+from chess_ai import ChessAI
+from transposition_table import TranspositionTable
+
+class TestTranspositionTable(unittest.TestCase):
+
+    def test_replacement_policy(self):
+        table = TranspositionTable(size_mb=0.001)
+        buckets = table.bucket_count
+        table.store(5, 6, 100, TranspositionTable.EXACT, 77)
+        # Same bucket, shallower: goes to the always replace slot and keeps the deep entry
+        table.store(5 + buckets, 2, -50, TranspositionTable.LOWER_BOUND)
+        table.store(5 + 2 * buckets, 1, 30, TranspositionTable.UPPER_BOUND)
+        self.assertEqual(table.probe(5), (6, 100, TranspositionTable.EXACT, 77))
+        self.assertIsNone(table.probe(5 + buckets))
+        self.assertEqual(table.probe(5 + 2 * buckets), (1, 30, TranspositionTable.UPPER_BOUND, 0))
+        # Deeper result takes over the depth preferred slot
+        table.store(5 + 3 * buckets, 8, ChessAI.MATE_SCORE - 3, TranspositionTable.EXACT)
+        self.assertEqual(table.probe(5 + 3 * buckets)[1], ChessAI.MATE_SCORE - 3)
+        self.assertIsNone(table.probe(5))
+
+        stats = table.stats()
+        self.assertEqual(stats['collisions'], 2)
+        self.assertEqual(stats['fill_rate'], 2 / stats['entries'])
+
+    def test_search_result_unchanged(self):
+        board_state = BoardState()
+        ai = ChessAI(3, hash_size_mb=1)
+        ai.transposition_table.probe = lambda key: None
+        expected = ai.choose_best_move(board_state, board_state.current_player_color)
+
+        ai = ChessAI(3, hash_size_mb=1)
+        score, move = ai.choose_best_move(board_state, board_state.current_player_color)
+        self.assertEqual(score, expected[0])
+        self.assertEqual((move.start, move.end), (expected[1].start, expected[1].end))
+        # A second search starts from the stored root entry
+        ai.choose_best_move(board_state, board_state.current_player_color)
+        self.assertGreater(ai.transposition_table.stats()['hits'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
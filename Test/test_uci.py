@@ -0,0 +1,52 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import time
+import unittest
+from piece import Piece
+from uci import UCIEngine, uci_to_move
+
+class TestUCI(unittest.TestCase):
+
+    def run_commands(self, *commands):
+        output = []
+        async def session():
+            engine = UCIEngine(output.append)
+            for command in commands:
+                await engine.handle(command)
+            await engine.search_task
+            return engine
+        return asyncio.run(session()), output
+
+    def test_position_with_moves_and_go_depth(self):
+        engine, output = self.run_commands("uci", "isready", "position startpos moves e2e4 e7e5 g1f3", "go depth 3")
+        self.assertIn("uciok", output)
+        self.assertIn("readyok", output)
+        self.assertEqual(engine.board_state.current_player_color, Piece.Black)
+        self.assertEqual(engine.board_state.get_piece(5, 5), Piece.WhiteKnight)
+        infos = [line.split() for line in output if line.startswith("info depth")]
+        self.assertEqual([int(info[2]) for info in infos], [1, 2, 3])
+        self.assertIn("nps", infos[-1])
+        # Nodes of the whole search so far, not of the last iteration
+        nodes = [int(info[info.index("nodes") + 1]) for info in infos]
+        self.assertEqual(nodes[-1], sum(iteration['nodes'] for iteration in engine.searcher.iterations))
+        bestmove = output[-1].split()
+        self.assertEqual(bestmove[0], "bestmove")
+        self.assertIsNotNone(uci_to_move(engine.board_state, bestmove[1]))
+
+    def test_go_with_only_the_opponents_clock_is_timed(self):
+        # White to move, only Black's clock given: still a timed search that ends by itself, without stop
+        start = time.perf_counter()
+        _, output = self.run_commands("position startpos", "go btime 1000")
+        self.assertLess(time.perf_counter() - start, UCIEngine.default_movetime / 1000 + 3)
+        self.assertEqual(output[-1].split()[0], "bestmove")
+
+    def test_mate_score(self):
+        _, output = self.run_commands("position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", "go movetime 300")
+        self.assertIn("score mate 1", output[-2])
+        self.assertEqual(output[-1].split()[:2], ["bestmove", "a1a8"])
+
+if __name__ == '__main__':
+    unittest.main()
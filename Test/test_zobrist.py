@@ -0,0 +1,56 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import zobrist
+from board_state import BoardState
+from chess_move import ChessMove
+from fen import FEN
+from move_generator import MoveGenerator
+from piece import Piece
+
+class TestZobrist(unittest.TestCase):
+
+    def walk(self, board_state, depth, move_generator):
+        if depth == 0:
+            return
+        for move in move_generator.generate_legal_moves(board_state):
+            board_state.make_move(move, detect_game_over=False)
+            self.walk(board_state, depth - 1, move_generator)
+            board_state.undo_last_move()
+
+    def test_incremental_hash_matches_recompute(self):
+        board_state = BoardState()
+        FEN().fen_to_board_state(FEN.fen_position_2, board_state)
+        start_hash = board_state.zobrist_hash
+        board_state.debug_hash = True
+        # Position 2 covers castling, en passant, promotion and rook captures within two plies
+        self.walk(board_state, 2, MoveGenerator())
+        self.assertEqual(board_state.zobrist_hash, start_hash)
+
+    def test_transposition_has_same_hash(self):
+        board_state = BoardState()
+        start_hash = board_state.zobrist_hash
+        knight_moves = [
+            ChessMove(Piece.WhiteKnight, (7, 6), (5, 5)),
+            ChessMove(Piece.BlackKnight, (0, 6), (2, 5)),
+            ChessMove(Piece.WhiteKnight, (5, 5), (7, 6)),
+        ]
+        for move in knight_moves:
+            board_state.make_move(move)
+        self.assertNotEqual(board_state.zobrist_hash, start_hash)  # Black to move
+        board_state.make_move(ChessMove(Piece.BlackKnight, (2, 5), (0, 6)))
+        self.assertEqual(board_state.zobrist_hash, start_hash)
+        self.assertEqual(board_state.zobrist_hash, zobrist.compute_hash(board_state))
+
+    def test_en_passant_file_is_part_of_the_hash(self):
+        with_target = BoardState()
+        with_target.make_move(ChessMove(Piece.WhitePawn, (6, 4), (4, 4)))
+        without_target = BoardState()
+        FEN().fen_to_board_state("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1", without_target)
+        self.assertNotEqual(with_target.zobrist_hash, without_target.zobrist_hash)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+Precomputed attack sets for every piece type, indexed by square (row * 8 + col, see bitboard.py).
+
+Sliding pieces use one dict per square keyed by the occupancy of the squares that can block them
+(edge squares never block, so they are masked away). The dict is the perfect hash a magic multiplier
+would provide in C, a slider's full attack set for any occupancy is one AND and one lookup:
+
+    ROOK_ATTACKS[square][occupied & ROOK_MASKS[square]]
+
+The tables are built once at import, which takes a fraction of a second.
+"""
+from bitboard import FULL, NOT_FILE_A, NOT_FILE_AB, NOT_FILE_GH, NOT_FILE_H
+
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, 1), (0, -1)]
+BISHOP_DIRECTIONS = [(-1, 1), (-1, -1), (1, 1), (1, -1)]
+
+
+def _ray_attacks(square, occupied, directions):
+    attacks = 0
+    row, col = square >> 3, square & 7
+    for dir_row, dir_col in directions:
+        r, c = row + dir_row, col + dir_col
+        while 0 <= r < 8 and 0 <= c < 8:
+            bit = 1 << (r * 8 + c)
+            attacks |= bit
+            if occupied & bit:
+                break
+            r += dir_row
+            c += dir_col
+    return attacks
+
+
+def _blocker_mask(square, directions):
+    """Squares along the rays whose occupancy matters, i.e. every ray square except the last one."""
+    mask = 0
+    row, col = square >> 3, square & 7
+    for dir_row, dir_col in directions:
+        r, c = row + dir_row, col + dir_col
+        while 0 <= r + dir_row < 8 and 0 <= c + dir_col < 8:
+            mask |= 1 << (r * 8 + c)
+            r += dir_row
+            c += dir_col
+    return mask
+
+
+def _build_slider_table(directions):
+    masks = []
+    tables = []
+    for square in range(64):
+        mask = _blocker_mask(square, directions)
+        # Every ray is handled on its own, then each blocker subset is the union of its rays' attacks
+        ray_tables = []
+        for direction in directions:
+            ray_mask = _blocker_mask(square, [direction])
+            ray_table = {}
+            subset = 0
+            while True:
+                ray_table[subset] = _ray_attacks(square, subset, [direction])
+                subset = (subset - ray_mask) & ray_mask
+                if subset == 0:
+                    break
+            ray_tables.append((ray_mask, ray_table))
+        # The rays do not overlap, so the table is the cross product of the ray tables, built a ray at a time
+        table = {0: 0}
+        for ray_mask, ray_table in ray_tables:
+            ray_items = ray_table.items()
+            table = {subset | ray_subset: attacks | ray_attacks
+                     for subset, attacks in table.items() for ray_subset, ray_attacks in ray_items}
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+def _build_between():
+    between = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        row, col = square >> 3, square & 7
+        for dir_row, dir_col in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            squares_between = 0
+            r, c = row + dir_row, col + dir_col
+            while 0 <= r < 8 and 0 <= c < 8:
+                target = r * 8 + c
+                between[square][target] = squares_between
+                squares_between |= 1 << target
+                r += dir_row
+                c += dir_col
+    return between
+
+
+def _build_knight_attacks():
+    attacks = []
+    for square in range(64):
+        bit = 1 << square
+        one_file = ((bit >> 1) & NOT_FILE_H) | ((bit << 1) & NOT_FILE_A)
+        two_files = ((bit >> 2) & NOT_FILE_GH) | ((bit << 2) & NOT_FILE_AB)
+        attacks.append(((one_file << 16) | (one_file >> 16) | (two_files << 8) | (two_files >> 8)) & FULL)
+    return attacks
+
+
+def _build_king_attacks():
+    attacks = []
+    for square in range(64):
+        bit = 1 << square
+        sideways = ((bit >> 1) & NOT_FILE_H) | ((bit << 1) & NOT_FILE_A)
+        row = bit | sideways
+        attacks.append((sideways | (row << 8) | (row >> 8)) & FULL)
+    return attacks
+
+
+def _build_pawn_attacks():
+    white = []
+    black = []
+    for square in range(64):
+        bit = 1 << square
+        white.append(((bit >> 9) & NOT_FILE_H) | ((bit >> 7) & NOT_FILE_A))
+        black.append((((bit << 7) & NOT_FILE_H) | ((bit << 9) & NOT_FILE_A)) & FULL)
+    return [white, black]
+
+
+KNIGHT_ATTACKS = _build_knight_attacks()
+KING_ATTACKS = _build_king_attacks()
+# Indexed by color index (0 white, 1 black) and then square
+PAWN_ATTACKS = _build_pawn_attacks()
+ROOK_MASKS, ROOK_ATTACKS = _build_slider_table(ROOK_DIRECTIONS)
+BISHOP_MASKS, BISHOP_ATTACKS = _build_slider_table(BISHOP_DIRECTIONS)
+# Squares strictly between two squares on a shared rank, file or diagonal, 0 when they are not aligned
+BETWEEN = _build_between()
+
+
+def rook_attacks(square, occupied):
+    return ROOK_ATTACKS[square][occupied & ROOK_MASKS[square]]
+
+
+def bishop_attacks(square, occupied):
+    return BISHOP_ATTACKS[square][occupied & BISHOP_MASKS[square]]
+
+
+def queen_attacks(square, occupied):
+    return ROOK_ATTACKS[square][occupied & ROOK_MASKS[square]] | BISHOP_ATTACKS[square][occupied & BISHOP_MASKS[square]]
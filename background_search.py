@@ -0,0 +1,122 @@
+import multiprocessing
+import time
+from fen import board_state_from_position, position_of
+from parallel_search import WorkerAI, move_key_of
+from piece import Piece
+
+
+def _search_loop(connection, stop_flag, max_depth, hash_size_mb, movetime):
+    """Child process, runs one search per request and answers with (score, move, principal variation)."""
+    ai = WorkerAI(max_depth, hash_size_mb, movetime)
+    ai.stop_flag = stop_flag
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        position, infinite = request
+        score, move = ai.search(board_state_from_position(position), infinite=infinite)
+        connection.send((score, move, ai.iterations[-1]['pv'] if ai.iterations else []))
+
+
+class BackgroundSearch:
+    """
+    Runs ChessAI.search in a child process, so the pygame loop keeps its frame rate while the engine uses its whole
+    budget (a thread would share the interpreter lock with the loop). The loop calls poll() every frame and gets
+    (score, move) once the search is done. The child keeps its transposition table from one search to the next.
+
+    While the opponent is to move the engine can ponder: it searches the position after the reply it expects.
+    When that reply is played the running search carries on for one more movetime, otherwise it is cancelled and a
+    normal search starts.
+    """
+
+    def __init__(self, max_depth, movetime, hash_size_mb=16):
+        self.max_depth = max_depth
+        self.movetime = movetime
+        self.hash_size_mb = hash_size_mb
+        self.process = None
+        self.busy = False
+        self.pondering = False
+        self.ponder_move = None
+        self.stop_at = None
+        self.pv = []
+
+    def start_process(self):
+        if self.process is None:
+            context = multiprocessing.get_context()
+            self.stop_flag = context.Value('b', 0, lock=False)
+            self.connection, child_connection = context.Pipe()
+            self.process = context.Process(target=_search_loop, daemon=True,
+                                           args=(child_connection, self.stop_flag, self.max_depth, self.hash_size_mb, self.movetime))
+            self.process.start()
+
+    def close(self):
+        self.cancel()
+        if self.process is not None:
+            self.connection.send(None)
+            self.process.join()
+            self.process = None
+
+    def start(self, board_state):
+        """Starts searching board_state, cancelling whatever was running."""
+        self.cancel()
+        self.request(board_state, infinite=False)
+
+    def ponder(self, board_state, expected_reply):
+        """Searches the position after expected_reply without a time limit until opponent_moved or cancel."""
+        self.cancel()
+        position = board_state.copy()
+        position.make_move(expected_reply, detect_game_over=False)
+        self.pondering = True
+        self.ponder_move = move_key_of(expected_reply)
+        self.request(position, infinite=True)
+
+    def opponent_moved(self, move, board_state):
+        """Call once the opponent's move is on board_state, the engine is to move now."""
+        key = move_key_of(move)
+        if move.piece & 7 == Piece.Pawn and move.end[0] in (0, 7):
+            # A move from the board leaves promotion at No_Piece (a queen), the expected reply names its piece
+            key = (move.start, move.end, board_state.board[move.end[0] * 8 + move.end[1]])
+        if self.pondering and key == self.ponder_move:
+            # Ponder hit, the search is already on the right position
+            self.pondering = False
+            self.ponder_move = None
+            self.stop_at = time.perf_counter() + self.movetime
+            return
+        self.start(board_state)
+
+    def request(self, board_state, infinite):
+        self.start_process()
+        self.stop_at = None
+        self.busy = True
+        self.connection.send((position_of(board_state), infinite))
+
+    def is_busy(self):
+        return self.busy
+
+    def poll(self):
+        """Returns (score, move) once, when the search has finished, None while it is thinking or pondering."""
+        if not self.busy or self.pondering:
+            return None
+        if self.stop_at is not None and time.perf_counter() >= self.stop_at:
+            self.stop_flag.value = 1
+            self.stop_at = None
+        if not self.connection.poll():
+            return None
+        score, move, self.pv = self.receive()
+        return score, move
+
+    def receive(self):
+        result = self.connection.recv()
+        # The child is idle again, a stop sent after its search had already ended must not hit the next one
+        self.stop_flag.value = 0
+        self.busy = False
+        return result
+
+    def cancel(self):
+        """Stops the running search or ponder and drops its result."""
+        if self.busy:
+            self.stop_flag.value = 1
+            self.receive()
+        self.pondering = False
+        self.ponder_move = None
+        self.stop_at = None
@@ -0,0 +1,97 @@
+from piece import Piece
+
+# Squares are numbered row * 8 + col, matching BoardState.board, so bit 0 is a8 and bit 63 is h1.
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL ^ FILE_A
+NOT_FILE_H = FULL ^ FILE_H
+NOT_FILE_AB = FULL ^ (FILE_A | FILE_A << 1)
+NOT_FILE_GH = FULL ^ (FILE_H | FILE_H >> 1)
+RANK_8 = 0xFF
+RANK_6 = RANK_8 << 16
+RANK_3 = RANK_8 << 40
+RANK_1 = RANK_8 << 56
+
+WHITE_INDEX = 0
+BLACK_INDEX = 1
+
+
+def square_index(row, col):
+    return row * 8 + col
+
+
+def square_position(square):
+    return (square >> 3, square & 7)
+
+
+def color_index(color):
+    """Maps Piece.White / Piece.Black (or any piece of that color) to 0 / 1."""
+    return 1 if color >= Piece.Black else 0
+
+
+def iterate_squares(bitboard):
+    while bitboard:
+        lowest_bit = bitboard & -bitboard
+        yield lowest_bit.bit_length() - 1
+        bitboard ^= lowest_bit
+
+
+def pop_count(bitboard):
+    return bin(bitboard).count('1')
+
+
+class Bitboards:
+    """
+    Bitboard view of a position: one 64-bit integer per piece code plus per-color and total occupancy.
+    Kept in sync with BoardState.board by BoardState itself, it is never the source of truth for the UI.
+    """
+
+    def __init__(self):
+        self.pieces = [0] * (Piece.MaxPieceIndex + 1)
+        self.occupancy = [0, 0]
+        self.occupied = 0
+
+    def add_piece(self, piece, square):
+        bit = 1 << square
+        self.pieces[piece] |= bit
+        self.occupancy[piece >> 3] |= bit
+        self.occupied |= bit
+
+    def remove_piece(self, piece, square):
+        mask = FULL ^ (1 << square)
+        self.pieces[piece] &= mask
+        self.occupancy[piece >> 3] &= mask
+        self.occupied &= mask
+
+    def move_piece(self, piece, from_square, to_square):
+        self.remove_piece(piece, from_square)
+        self.add_piece(piece, to_square)
+
+    def piece_at(self, square):
+        bit = 1 << square
+        if not self.occupied & bit:
+            return Piece.No_Piece
+        for piece in range(1, Piece.MaxPieceIndex + 1):
+            if self.pieces[piece] & bit:
+                return Piece(piece)
+        return Piece.No_Piece
+
+    def king_square(self, color):
+        king = self.pieces[Piece.King | color]
+        return king.bit_length() - 1 if king else None
+
+    def load_from_board(self, board):
+        self.pieces = [0] * (Piece.MaxPieceIndex + 1)
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        for square, piece in enumerate(board):
+            if piece != Piece.No_Piece:
+                self.add_piece(piece, square)
+
+    def copy(self):
+        new_bitboards = Bitboards()
+        new_bitboards.pieces = list(self.pieces)
+        new_bitboards.occupancy = list(self.occupancy)
+        new_bitboards.occupied = self.occupied
+        return new_bitboards
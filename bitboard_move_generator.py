@@ -0,0 +1,240 @@
+from attack_tables import BETWEEN, BISHOP_ATTACKS, BISHOP_MASKS, KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, ROOK_ATTACKS, ROOK_MASKS
+from bitboard import FULL, RANK_1, RANK_3, RANK_6, RANK_8, color_index, iterate_squares, square_index
+from chess_move import CAPTURED_SHIFT, FLAG_CASTLING, FLAG_EN_PASSANT, MAX_MOVES, PIECE_SHIFT, PROMOTION_TYPES, ChessMove
+from piece import Piece
+
+
+class BitboardMoveGenerator:
+    """
+    Move generation for BoardStates running on the bitboard backend, the BoardState is never modified while generating.
+    """
+
+    castling_squares = {
+        Piece.White: (60, 'K', 'KR', 'QR'),
+        Piece.Black: (4, 'k', 'kr', 'qr'),
+    }
+
+    def attacks_for_piece(self, piece, square, occupied):
+        piece_type = piece & 7
+        if piece_type == Piece.Pawn:
+            return PAWN_ATTACKS[piece >> 3][square]
+        if piece_type == Piece.Knight:
+            return KNIGHT_ATTACKS[square]
+        if piece_type == Piece.Bishop:
+            return BISHOP_ATTACKS[square][occupied & BISHOP_MASKS[square]]
+        if piece_type == Piece.Rook:
+            return ROOK_ATTACKS[square][occupied & ROOK_MASKS[square]]
+        if piece_type == Piece.Queen:
+            return ROOK_ATTACKS[square][occupied & ROOK_MASKS[square]] | BISHOP_ATTACKS[square][occupied & BISHOP_MASKS[square]]
+        return KING_ATTACKS[square]
+
+    def is_square_attacked(self, square, by_color, bitboards, occupied=None, removed=0):
+        """
+        Returns True if any piece of by_color attacks square.
+        occupied overrides the board occupancy and removed masks out captured attackers, so a move can be tested without making it.
+        """
+        pieces = bitboards.pieces
+        if occupied is None:
+            occupied = bitboards.occupied
+        keep = FULL ^ removed
+        if PAWN_ATTACKS[color_index(by_color) ^ 1][square] & pieces[Piece.Pawn | by_color] & keep:
+            return True
+        if KNIGHT_ATTACKS[square] & pieces[Piece.Knight | by_color] & keep:
+            return True
+        if KING_ATTACKS[square] & pieces[Piece.King | by_color]:
+            return True
+        diagonal = (pieces[Piece.Bishop | by_color] | pieces[Piece.Queen | by_color]) & keep
+        if diagonal and BISHOP_ATTACKS[square][occupied & BISHOP_MASKS[square]] & diagonal:
+            return True
+        straight = (pieces[Piece.Rook | by_color] | pieces[Piece.Queen | by_color]) & keep
+        if straight and ROOK_ATTACKS[square][occupied & ROOK_MASKS[square]] & straight:
+            return True
+        return False
+
+    def attackers_to(self, square, by_color, bitboards, occupied):
+        pieces = bitboards.pieces
+        return ((PAWN_ATTACKS[color_index(by_color) ^ 1][square] & pieces[Piece.Pawn | by_color])
+                | (KNIGHT_ATTACKS[square] & pieces[Piece.Knight | by_color])
+                | (KING_ATTACKS[square] & pieces[Piece.King | by_color])
+                | (BISHOP_ATTACKS[square][occupied & BISHOP_MASKS[square]] & (pieces[Piece.Bishop | by_color] | pieces[Piece.Queen | by_color]))
+                | (ROOK_ATTACKS[square][occupied & ROOK_MASKS[square]] & (pieces[Piece.Rook | by_color] | pieces[Piece.Queen | by_color])))
+
+    def get_attacked_squares(self, bitboards, color, occupied=None):
+        attacked = 0
+        if occupied is None:
+            occupied = bitboards.occupied
+        for piece_type in (Piece.Pawn, Piece.Knight, Piece.Bishop, Piece.Rook, Piece.Queen, Piece.King):
+            piece = piece_type | color
+            for square in iterate_squares(bitboards.pieces[piece]):
+                attacked |= self.attacks_for_piece(piece, square, occupied)
+        return attacked
+
+    def get_pin_rays(self, bitboards, color, king_square):
+        """
+        Maps the square of every piece pinned to color's king to the squares it may still move to:
+        the line between the king and the pinning slider, including the slider itself.
+        """
+        pieces = bitboards.pieces
+        opponent = Piece.get_opposite_color(color)
+        own = bitboards.occupancy[color_index(color)]
+        occupied = bitboards.occupied
+        snipers = ((ROOK_ATTACKS[king_square][0] & (pieces[Piece.Rook | opponent] | pieces[Piece.Queen | opponent]))
+                   | (BISHOP_ATTACKS[king_square][0] & (pieces[Piece.Bishop | opponent] | pieces[Piece.Queen | opponent])))
+        pin_rays = {}
+        for sniper in iterate_squares(snipers):
+            between = BETWEEN[king_square][sniper]
+            blockers = between & occupied
+            # Exactly one blocker, and it is ours
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pin_rays[blockers.bit_length() - 1] = between | (1 << sniper)
+        return pin_rays
+
+    def is_king_in_check(self, bitboards, color):
+        king_square = bitboards.king_square(color)
+        if king_square is None:
+            return False
+        return self.is_square_attacked(king_square, Piece.get_opposite_color(color), bitboards)
+
+    def leaves_king_safe(self, bitboards, opponent, king_square, from_square, to_square, captured_square=None):
+        if king_square is None:
+            # No king on a hand made board, like is_king_in_check nothing can be exposed
+            return True
+        removed = 0 if captured_square is None else 1 << captured_square
+        occupied = ((bitboards.occupied & ~(1 << from_square)) & ~removed) | (1 << to_square)
+        if king_square == from_square:
+            king_square = to_square
+        return not self.is_square_attacked(king_square, opponent, bitboards, occupied, removed)
+
+    def generate_legal_moves(self, board_state, color, from_mask=FULL, captures_only=False):
+        """generate_packed_moves as a list of ChessMoves."""
+        buffer = [0] * MAX_MOVES
+        count = self.generate_packed_moves(board_state, color, buffer, from_mask, captures_only)
+        return [ChessMove.from_packed(buffer[index]) for index in range(count)]
+
+    def generate_packed_moves(self, board_state, color, buffer, from_mask=FULL, captures_only=False):
+        """
+        Generates only legal moves, written as packed ints (see chess_move.encode_move) into buffer from index 0 on.
+        Returns how many were written.
+        Checkers, pinned pieces and the squares the opponent attacks are worked out once,
+        after that every target set is masked instead of tested move by move. En passant, which can expose the king
+        along the rank of both pawns, is the one move still verified on adjusted occupancy.
+        With captures_only set, only captures and queen promotions are generated, for the quiescence search.
+        """
+        bitboards = board_state.bitboards
+        board = board_state.board
+        pieces = bitboards.pieces
+        us = color_index(color)
+        own = bitboards.occupancy[us]
+        enemy = bitboards.occupancy[us ^ 1]
+        occupied = bitboards.occupied
+        opponent = Piece.get_opposite_color(color)
+        king_square = bitboards.king_square(color)
+        # Landing squares before check and pin restrictions
+        target_mask = enemy if captures_only else FULL ^ own
+        count = 0
+
+        if king_square is None:
+            # Only happens on hand made test boards, nothing to keep safe
+            check_mask = FULL
+            pin_rays = {}
+            checkers = 0
+        else:
+            checkers = self.attackers_to(king_square, opponent, bitboards, occupied)
+            if not checkers:
+                check_mask = FULL
+            elif checkers & (checkers - 1):
+                check_mask = 0  # Double check, only the king can move
+            else:
+                check_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+            pin_rays = self.get_pin_rays(bitboards, color, king_square)
+
+            if from_mask & (1 << king_square):
+                # The king must not hide behind itself from a slider, so it is taken off the board for the attack map
+                danger = self.get_attacked_squares(bitboards, opponent, occupied ^ (1 << king_square))
+                base = king_square | (Piece.King | color) << PIECE_SHIFT
+                for to_square in iterate_squares(KING_ATTACKS[king_square] & target_mask & ~danger):
+                    buffer[count] = base | to_square << 6 | board[to_square] << CAPTURED_SHIFT
+                    count += 1
+                if not checkers and not captures_only:
+                    count = self.generate_castling_moves(board_state, color, king_square, danger, buffer, count)
+
+        if check_mask:
+            piece_targets = target_mask & check_mask
+            for piece_type in (Piece.Knight, Piece.Bishop, Piece.Rook, Piece.Queen):
+                piece = piece_type | color
+                for from_square in iterate_squares(pieces[piece] & from_mask):
+                    targets = self.attacks_for_piece(piece, from_square, occupied) & piece_targets
+                    if from_square in pin_rays:
+                        targets &= pin_rays[from_square]
+                    base = from_square | piece << PIECE_SHIFT
+                    # iterate_squares inlined, this is the innermost loop of the generator
+                    while targets:
+                        lowest_bit = targets & -targets
+                        to_square = lowest_bit.bit_length() - 1
+                        targets ^= lowest_bit
+                        buffer[count] = base | to_square << 6 | board[to_square] << CAPTURED_SHIFT
+                        count += 1
+
+        pawn = Piece.Pawn | color
+        empty = FULL ^ occupied
+        if captures_only:
+            # Pushes only when they promote
+            empty &= RANK_8 | RANK_1
+        en_passant = board_state.get_en_passant_square()
+        en_passant_bit = 0 if en_passant is None else 1 << square_index(*en_passant)
+        # The quiescence search only looks at queen promotions
+        promotions = PROMOTION_TYPES[:1] if captures_only else PROMOTION_TYPES
+        for from_square in iterate_squares(pieces[pawn] & from_mask):
+            bit = 1 << from_square
+            if color == Piece.White:
+                single = (bit >> 8) & empty
+                double = ((single & RANK_3) >> 8) & empty
+            else:
+                single = (bit << 8) & empty
+                double = ((single & RANK_6) << 8) & empty
+            attacks = PAWN_ATTACKS[us][from_square]
+            targets = (single | double | (attacks & enemy)) & check_mask
+            if from_square in pin_rays:
+                targets &= pin_rays[from_square]
+            base = from_square | pawn << PIECE_SHIFT
+            while targets:
+                lowest_bit = targets & -targets
+                to_square = lowest_bit.bit_length() - 1
+                targets ^= lowest_bit
+                code = base | to_square << 6 | board[to_square] << CAPTURED_SHIFT
+                if to_square < 8 or to_square >= 56:
+                    for promotion in promotions:
+                        buffer[count] = code | promotion << 12
+                        count += 1
+                else:
+                    buffer[count] = code
+                    count += 1
+            if attacks & en_passant_bit:
+                to_square = en_passant_bit.bit_length() - 1
+                captured_square = (from_square & ~7) | (to_square & 7)
+                if self.leaves_king_safe(bitboards, opponent, king_square, from_square, to_square, captured_square):
+                    buffer[count] = base | to_square << 6 | board[captured_square] << CAPTURED_SHIFT | FLAG_EN_PASSANT
+                    count += 1
+
+        return count
+
+    def generate_castling_moves(self, board_state, color, king_square, danger, buffer, count):
+        """
+        Writes the castling moves of a king that is not in check into buffer from index count on, danger being every
+        square the opponent attacks. Returns the new count.
+        """
+        home, king_key, kingside_key, queenside_key = self.castling_squares[color]
+        has_moved = board_state.has_moved
+        if king_square != home or has_moved[king_key]:
+            return count
+        bitboards = board_state.bitboards
+        occupied = bitboards.occupied
+        rooks = bitboards.pieces[Piece.Rook | color]
+        base = home | (Piece.King | color) << PIECE_SHIFT | FLAG_CASTLING
+        if not has_moved[kingside_key] and rooks & (1 << (home + 3)) and not (occupied | danger) & (0b11 << (home + 1)):
+            buffer[count] = base | (home + 2) << 6
+            count += 1
+        if not has_moved[queenside_key] and rooks & (1 << (home - 4)) and not occupied & (0b111 << (home - 3)) and not danger & (0b11 << (home - 2)):
+            buffer[count] = base | (home - 2) << 6
+            count += 1
+        return count
@@ -10,6 +10,7 @@ class BoardDrawer:
         self.board_size = board_size
         self.square_size = square_size
         self.board_surface = self._init_board_surface()
+        self.move_marker = self._init_move_marker()
 
     def _init_board_surface(self):
         surface = pygame.Surface((self.board_size, self.board_size))
@@ -19,9 +20,23 @@ class BoardDrawer:
                 pygame.draw.rect(surface, square_color, (i * self.square_size, j * self.square_size, self.square_size, self.square_size))
         return surface
 
+    def _init_move_marker(self):
+        # Drawn once, blended onto every square a selected piece can move to
+        marker = pygame.Surface((self.square_size, self.square_size), pygame.SRCALPHA)
+        pygame.draw.circle(marker, self.VALID_MOVE_COLOR, (self.square_size // 2, self.square_size // 2), self.square_size // 8)
+        return marker
+
     def draw_board(self, screen):
         screen.blit(self.board_surface, (0, 0))
 
+    def draw_square(self, screen, row, col):
+        """Paints one empty square, copied from the prerendered board."""
+        rect = (col * self.square_size, row * self.square_size, self.square_size, self.square_size)
+        screen.blit(self.board_surface, rect, rect)
+
+    def draw_valid_move_marker(self, screen, row, col):
+        screen.blit(self.move_marker, (col * self.square_size, row * self.square_size))
+
     def highlight_square(self, screen, position):
         x, y = position
         pygame.draw.rect(screen, self.SELECTED_SQAURE_COLOR, (x * self.square_size, y * self.square_size, self.square_size, self.square_size), 4)
@@ -29,12 +44,6 @@ class BoardDrawer:
     def draw_valid_moves(self, screen, valid_moves):
         if not valid_moves:
             return
-        
-        temp_surface = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-        radius = self.square_size // 8
         for move in valid_moves:
             row, col = move.end
-            screen_x = col * self.square_size + self.square_size / 2
-            screen_y = row * self.square_size + self.square_size / 2
-            pygame.draw.circle(temp_surface, self.VALID_MOVE_COLOR, (int(screen_x), int(screen_y)), radius)
-        screen.blit(temp_surface, (0, 0))
+            self.draw_valid_move_marker(screen, row, col)
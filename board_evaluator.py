@@ -1,9 +1,20 @@
+import argparse
+import time
+from bitboard import pop_count, square_index
 from move_generator import MoveGenerator
 from piece import Piece
 
 
 class BoardEvaluator:
     
+    center_mask = (1 << square_index(3, 3)) | (1 << square_index(3, 4)) | (1 << square_index(4, 3)) | (1 << square_index(4, 4))
+
+    # Centipawns by piece type, the same unit as the square tables
+    piece_values = [0, 100, 320, 330, 500, 900, 20000]
+    # Game phase by piece type, the full set of pieces adds up to PHASE_TOTAL (pure midgame), bare kings to 0 (pure endgame)
+    phase_weights = [0, 0, 1, 1, 2, 4, 0]
+    PHASE_TOTAL = 24
+
     pawn_table = [
         0, 0, 0, 0, 0, 0, 0, 0,
         5, 10, 10, -20, -20, 10, 10, 5,
@@ -82,15 +93,13 @@ class BoardEvaluator:
     ]
     
     def evaluate(self, board_state, color):
-        score = 0
-        game_phase = self.determine_game_phase(board_state)
-
-        # Adjust the base score based on piece positions and types
-        active_positions = board_state.white_positions if color == Piece.White else board_state.black_positions
-        for position in active_positions:
-            r, c, piece = position
-            table_index = r * 8 + c
-            score += self.get_adjusted_piece_value(piece, table_index, game_phase)
+        """
+        Static score of the position from color's point of view in centipawns, positive when color is ahead.
+        BoardState keeps the midgame and endgame sums of material and square tables up to date move by move,
+        they are blended here by how much material is left (see phase_weights).
+        """
+        phase = min(board_state.phase, self.PHASE_TOTAL)
+        score = (board_state.midgame_score * phase + board_state.endgame_score * (self.PHASE_TOTAL - phase)) // self.PHASE_TOTAL
 
         # Encourage piece development and center control
         # score += self.evaluate_piece_development(board_state, color) * 0.5
@@ -102,35 +111,25 @@ class BoardEvaluator:
         #score += self.evaluate_mobility(board_state, color, active_positions)
         #score += self.evaluate_threats(board_state, color, active_positions)
 
-        return score
-
-
-    def get_adjusted_piece_value(self, piece, table_index, game_phase):
-        base_value = Piece.get_piece_value(piece)
-        color = Piece.get_piece_color(piece)
-        table_scale = 1  # Adjust the scaling factor if necessary
-
-        if Piece.is_pawn(piece):
-            adjustment = self.pawn_table[table_index] if color == Piece.White else -self.pawn_table[63 - table_index]
-        elif Piece.is_knight(piece):
-            adjustment = self.knight_table[table_index] if color == Piece.White else -self.knight_table[63 - table_index]
-        elif Piece.is_bishop(piece):
-            adjustment = self.bishop_table[table_index] if color == Piece.White else -self.bishop_table[63 - table_index]
-        elif Piece.is_rook(piece):
-            adjustment = self.rook_table[table_index] if color == Piece.White else -self.rook_table[63 - table_index]
-        elif Piece.is_queen(piece):
-            adjustment = self.queen_table[table_index] if color == Piece.White else -self.queen_table[63 - table_index]
-        elif Piece.is_king(piece):
-            # Use the king's endgame table if in the endgame, otherwise use the standard king table
-            if game_phase == 'endgame':
-                adjustment = self.king_endgame_table[table_index] if color == Piece.White else -self.king_endgame_table[63 - table_index]
-            else:
-                adjustment = self.king_table[table_index] if color == Piece.White else -self.king_table[63 - table_index]
-        else:
-            # For unforeseen piece types, no adjustment is made
-            adjustment = 0
-
-        return base_value + adjustment * table_scale
+        return score if color == Piece.White else -score
+
+    def evaluate_batch(self, boards, colors=None):
+        """
+        Scores many positions in one pass, boards being an (N, 64) int8 array of pieces indexed row * 8 + col
+        (see board_array). Returns what evaluate gives for each of them as an int64 array, from White's point of view,
+        or from colors[i]'s when an array of Piece.White / Piece.Black is passed.
+        """
+        import numpy as np
+        midgame_table, endgame_table, phase_table, squares = batch_tables()
+        boards = np.asarray(boards, dtype=np.int8)
+        midgame = midgame_table[boards, squares].sum(axis=1)
+        endgame = endgame_table[boards, squares].sum(axis=1)
+        phase = np.minimum(phase_table[boards].sum(axis=1), self.PHASE_TOTAL)
+        # Floor division like evaluate, so the results are identical for negative scores too
+        scores = (midgame * phase + endgame * (self.PHASE_TOTAL - phase)) // self.PHASE_TOTAL
+        if colors is not None:
+            scores = np.where(np.asarray(colors) == Piece.White, scores, -scores)
+        return scores
 
     def adjust_pawn_table(self, table_index, game_phase):
         base_value = BoardEvaluator.pawn_table[table_index]
@@ -141,21 +140,6 @@ class BoardEvaluator:
         # No adjustment or different adjustments can be made for middle and endgame phases
         return base_value
 
-    
-    def determine_game_phase(self, board_state):
-        # Count the number of queens and pawns as they significantly influence the game phase
-        queen_count = sum(1 for row in board_state.board for piece in row if Piece.is_queen(piece))
-        pawn_count = sum(1 for row in board_state.board for piece in row if Piece.is_pawn(piece))
-
-        # Consider a game in the middle phase if there are fewer queens or many pawns, indicating more early-game conditions
-        if queen_count < 2 or pawn_count > 12:
-            return 'middle'
-        # Adjust the thresholds as needed based on your game analysis
-        elif pawn_count <= 8:
-            return 'endgame'
-        else:
-            return 'early'
-        
     def evaluate_piece_development(self, board_state, color):
         development_score = 0
         undeveloped_penalty = -10  # Penalty for each undeveloped piece
@@ -167,7 +151,7 @@ class BoardEvaluator:
             undeveloped_positions = [(0, 1), (0, 6), (0, 2), (0, 5)]  # Black's knights and bishops on the 1st rank (0th row in 0-indexed)
 
         for r, c in undeveloped_positions:
-            piece = board_state.board[r][c]
+            piece = board_state.board[r * 8 + c]
             if piece == Piece.No_Piece or Piece.get_piece_color(piece) != color:
                 development_score += undeveloped_penalty
 
@@ -181,6 +165,10 @@ class BoardEvaluator:
 
         # Instantiate MoveGenerator and get all attacked squares by the given color
         move_generator = MoveGenerator()
+        if board_state.bitboards is not None:
+            # Same attack tables the move generator uses, counted straight off the bitboard
+            attacked = move_generator.bitboard_generator.get_attacked_squares(board_state.bitboards, color)
+            return pop_count(attacked & self.center_mask) * center_control_bonus
         attacked_squares = move_generator.get_attacked_squares(board_state, color)
 
         # Check if any center squares are in the set of attacked squares
@@ -219,9 +207,8 @@ class BoardEvaluator:
         mobility_score = 0
         mobility_bonus = 1  # Bonus for each legal move
         move_generator = MoveGenerator()
-        for position in active_positions:
-            piece = board_state.board[position[0]][position[1]]
-            legal_moves = move_generator.get_moves_for_piece(piece, (position[0],position[1]), board_state)
+        for position in list(active_positions):
+            legal_moves = move_generator.get_moves_for_piece(position, board_state)
             #board_state.get_legal_moves(position)
             mobility_score += len(legal_moves) * mobility_bonus
 
@@ -237,12 +224,121 @@ class BoardEvaluator:
         
         # Threats made by the player's pieces
         for target in attacked_squares:
-            if Piece.get_piece_color(board_state.board[target[0]][target[1]]) is not color:
+            if Piece.get_piece_color(board_state.board[target[0] * 8 + target[1]]) != color:
                 threat_score += threat_bonus
 
         for target in attacked_squares:
-            if Piece.get_piece_color(board_state.board[target[0]][target[1]]) is color:
+            if Piece.get_piece_color(board_state.board[target[0] * 8 + target[1]]) == color:
                 threat_score += threat_penalty
 
         return threat_score
-    
\ No newline at end of file
+
+
+def _square_scores(endgame):
+    """
+    Material plus square table bonus of every piece on every square, from White's point of view (Black's pieces count
+    negative). The kings use their endgame table for the endgame scores, the other pieces the same table in both.
+    """
+    tables = [None, BoardEvaluator.pawn_table, BoardEvaluator.knight_table, BoardEvaluator.bishop_table, BoardEvaluator.rook_table,
+              BoardEvaluator.queen_table, BoardEvaluator.king_endgame_table if endgame else BoardEvaluator.king_table]
+    scores = [[0] * 64 for _ in range(Piece.MaxPieceIndex + 1)]
+    for piece_type in range(Piece.Pawn, Piece.King + 1):
+        for color in (Piece.White, Piece.Black):
+            for square in range(64):
+                # The tables are laid out from the owner's back rank, which is row 7 for White and row 0 for Black
+                value = BoardEvaluator.piece_values[piece_type] + tables[piece_type][square ^ 56 if color == Piece.White else square]
+                scores[piece_type | color][square] = value if color == Piece.White else -value
+    return scores
+
+
+# Indexed [piece][row * 8 + col], added and subtracted by BoardState as pieces come and go
+MIDGAME_SCORES = _square_scores(endgame=False)
+ENDGAME_SCORES = _square_scores(endgame=True)
+PHASE_WEIGHTS = [BoardEvaluator.phase_weights[piece & 7] if piece & 7 <= Piece.King else 0 for piece in range(Piece.MaxPieceIndex + 1)]
+_batch_tables = None
+
+
+def batch_tables():
+    """
+    The tables above as NumPy arrays for evaluate_batch: (midgame, endgame, phase, square indices). Built on first
+    use, NumPy is only imported by the batch functions so the search starts without it.
+    """
+    global _batch_tables
+    if _batch_tables is None:
+        import numpy as np
+        _batch_tables = (np.array(MIDGAME_SCORES, dtype=np.int64), np.array(ENDGAME_SCORES, dtype=np.int64),
+                         np.array(PHASE_WEIGHTS, dtype=np.int64), np.arange(64))
+    return _batch_tables
+
+
+def board_array(board_state):
+    """The pieces of board_state as a row of 64 int8 values, one row of the evaluate_batch input."""
+    import numpy as np
+    return np.frombuffer(board_state.board, dtype=np.int8).copy()
+
+
+def compute_scores(board_state):
+    """(midgame score, endgame score, phase) of board_state computed from scratch, BoardState keeps them incrementally."""
+    midgame = endgame = phase = 0
+    for square, piece in enumerate(board_state.board):
+        if piece != Piece.No_Piece:
+            midgame += MIDGAME_SCORES[piece][square]
+            endgame += ENDGAME_SCORES[piece][square]
+            phase += PHASE_WEIGHTS[piece]
+    return midgame, endgame, phase
+
+
+def random_positions(count, seed=0, max_plies=80):
+    """count positions from random games (see corpus.random_playouts), as evaluate_batch input (boards, colors)."""
+    import numpy as np
+    from board_state import BoardState
+    from corpus import random_playouts
+    boards = np.empty((count, 64), dtype=np.int8)
+    colors = np.empty(count, dtype=np.int8)
+    board_state = BoardState()
+    index = 0
+    for move in random_playouts(seed, max_plies, board_state):
+        if move is None:
+            continue
+        boards[index] = board_array(board_state)
+        colors[index] = board_state.current_player_color
+        index += 1
+        if index == count:
+            break
+    return boards, colors
+
+
+def benchmark(count, seed=0):
+    """
+    Scores count random positions one at a time (loading each into a BoardState, then evaluate) and with one
+    evaluate_batch call, checks both agree and returns the positions per second of each.
+    """
+    from board_state import BoardState
+    boards, colors = random_positions(count, seed)
+    evaluator = BoardEvaluator()
+    board_state = BoardState()
+
+    start = time.perf_counter()
+    scalar = []
+    for board, color in zip(boards, colors):
+        board_state.board[:] = board.tobytes()
+        board_state.rebuild_from_board()
+        scalar.append(evaluator.evaluate(board_state, int(color)))
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = evaluator.evaluate_batch(boards, colors)
+    batch_time = time.perf_counter() - start
+
+    if batch.tolist() != scalar:
+        raise AssertionError("evaluate_batch differs from evaluate")
+    return {'positions': count, 'scalar_per_second': count / scalar_time, 'batch_per_second': count / batch_time}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare evaluate_batch with one evaluate call per position.")
+    parser.add_argument('--positions', type=int, default=20000)
+    args = parser.parse_args()
+    result = benchmark(args.positions)
+    print(f"{result['positions']} positions: {result['scalar_per_second']:.0f}/s one at a time, "
+          f"{result['batch_per_second']:.0f}/s batched, x{result['batch_per_second'] / result['scalar_per_second']:.0f}")
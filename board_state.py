@@ -1,30 +1,44 @@
 import copy
 import pickle
-import numpy as np
-from board_evaluator import BoardEvaluator
-from chess_move import ChessMove
+from bitboard import Bitboards
+from board_evaluator import ENDGAME_SCORES, MIDGAME_SCORES, PHASE_WEIGHTS, compute_scores
+from chess_move import PIECE_SHIFT, ChessMove
 from fen import FEN
 from move_generator import MoveGenerator
 from piece import Piece
+import zobrist
 
 class BoardState:
-    board = np.empty((8, 8), dtype=Piece)
+    # Piece codes as plain ints, indexed row * 8 + col
+    board = bytearray(64)
     current_valid_moves = []
     selected_piece_position = None
     has_moved = {'K': False, 'Q': False, 'k': False, 'q': False, 'KR': False, 'QR': False, 'kr': False, 'qr': False}  # Track if kings and rooks have moved for castling
     is_game_over = False
-    black_positions = []
-    white_positions = []
     move_number = {Piece.Black:0, Piece.White:0}
     current_player_color = Piece.White
-    captured_en_passant = None
-    captured_en_passant_position = None
-    castling_rook_position_start = None
-    castling_rook_position_end = None
-    castling_rook = None
+    en_passant_square = None
+    halfmove_clock = 0
+    debug_hash = False  # When True every move and undo checks the incremental hash against a full recompute
     
     fen = FEN()
-    def __init__(self):
+    rook_corners = {(7, 0): 'QR', (7, 7): 'KR', (0, 0): 'qr', (0, 7): 'kr'}
+
+    def __init__(self, use_bitboards=True):
+        # Per-instance state, the class level defaults above would otherwise be shared between copies
+        self.board = bytearray(64)
+        self.move_history = []
+        self.has_moved = dict(BoardState.has_moved)
+        # Bitboard backend, MoveGenerator uses it for move generation and attack detection when present
+        self.bitboards = Bitboards() if use_bitboards else None
+        # Pieces of each color keyed by (row, col), and the king squares, kept up to date move by move
+        self.piece_positions = {Piece.White: {}, Piece.Black: {}}
+        self.king_positions = {Piece.White: None, Piece.Black: None}
+        self._zobrist_hash = 0
+        # Material and square table sums from White's point of view and the game phase, see BoardEvaluator.evaluate
+        self.midgame_score = 0
+        self.endgame_score = 0
+        self.phase = 0
         self.reset_board()
     move_history = []
 
@@ -47,23 +61,86 @@ class BoardState:
         self.move_history = loaded_data['move_history']
         print ("loaded game states with ", len(self.move_history), " moves in history")
         #print (self.move_history)
-        for (move, _) in self.move_history:
-            print (move.piece, "from ", move.start, "to ", move.end, "captured: ", move.captured_piece, "at ", move.captured_position)
+        for (move, _, captured_piece, captured_position, *_) in self.move_history:
+            print (move.piece, "from ", move.start, "to ", move.end, "captured: ", captured_piece, "at ", captured_position)
             
     def reset_board(self):
         self.current_fen_state = self.fen.initial_board_configuration
         self.last_double_move = None
         self.is_game_over = False
         self.move_number = {Piece.Black:0, Piece.White:0}
-        self.captured_en_passant = None
-        self.captured_en_passant_position = None        
+        self.en_passant_square = None
+        self.halfmove_clock = 0
+        self.move_history = []
         self.fen.fen_to_board_state(self.current_fen_state, self)
 
+    def rebuild_from_board(self):
+        """
+        Recomputes the state derived from board, call after board has been written directly (e.g. by FEN parsing).
+        """
+        self.piece_positions = {Piece.White: {}, Piece.Black: {}}
+        self.king_positions = {Piece.White: None, Piece.Black: None}
+        for square, piece in enumerate(self.board):
+            if piece != Piece.No_Piece:
+                position = (square >> 3, square & 7)
+                self.piece_positions[piece & 8][position] = piece
+                if piece & 7 == Piece.King:
+                    self.king_positions[piece & 8] = position
+        if self.bitboards is not None:
+            self.bitboards.load_from_board(self.board)
+        self._zobrist_hash = zobrist.compute_hash(self)
+        self.midgame_score, self.endgame_score, self.phase = compute_scores(self)
+
+    @property
+    def zobrist_hash(self):
+        """
+        64-bit key of the position: piece placement, side to move, castling rights and en passant file.
+        """
+        return self._zobrist_hash
+
+    def verify_hash(self):
+        expected = zobrist.compute_hash(self)
+        if self._zobrist_hash != expected:
+            raise AssertionError(f"Zobrist hash out of sync: {self._zobrist_hash:016x} != {expected:016x}")
+        scores = compute_scores(self)
+        if (self.midgame_score, self.endgame_score, self.phase) != scores:
+            raise AssertionError(f"Evaluation out of sync: {(self.midgame_score, self.endgame_score, self.phase)} != {scores}")
+
+    def _add_piece(self, piece, position):
+        """
+        Places piece on the board and in every structure derived from it, all board changes made by moves go through here.
+        """
+        square = position[0] * 8 + position[1]
+        self.board[square] = piece
+        self.piece_positions[piece & 8][position] = piece
+        if piece & 7 == Piece.King:
+            self.king_positions[piece & 8] = position
+        if self.bitboards is not None:
+            self.bitboards.add_piece(piece, square)
+        self._zobrist_hash ^= zobrist.PIECE_SQUARE[piece][square]
+        self.midgame_score += MIDGAME_SCORES[piece][square]
+        self.endgame_score += ENDGAME_SCORES[piece][square]
+        self.phase += PHASE_WEIGHTS[piece]
+
+    def _remove_piece(self, piece, position):
+        square = position[0] * 8 + position[1]
+        self.board[square] = Piece.No_Piece
+        del self.piece_positions[piece & 8][position]
+        if piece & 7 == Piece.King:
+            self.king_positions[piece & 8] = None
+        if self.bitboards is not None:
+            self.bitboards.remove_piece(piece, square)
+        self._zobrist_hash ^= zobrist.PIECE_SQUARE[piece][square]
+        self.midgame_score -= MIDGAME_SCORES[piece][square]
+        self.endgame_score -= ENDGAME_SCORES[piece][square]
+        self.phase -= PHASE_WEIGHTS[piece]
+
     def num_moves_without_capture(self):
         return max(self.move_number[Piece.White], self.move_number[Piece.Black])
     
-    def end_turn(self):
+    def end_turn(self, detect_game_over=True):
         self.current_player_color = Piece.get_opposite_color(self.current_player_color)
+        self._zobrist_hash ^= zobrist.BLACK_TO_MOVE
         #print ("end turn")
         #print (self.current_player_color)
         if (self.current_player_color == Piece.White):
@@ -71,6 +148,9 @@ class BoardState:
         else:
             self.move_number[Piece.Black] += 1
             
+        if not detect_game_over:
+            # The search finds mates itself, no need to generate the replies twice
+            return
         board_mover = MoveGenerator()
         #self.prepare() # is this needed?
         if (board_mover.is_checkmate(self.current_player_color, self)):
@@ -91,139 +171,168 @@ class BoardState:
         return False
     
     def get_piece(self, row, col):
-        return self.board[row][col] 
+        return self.board[row * 8 + col]
     
-    def execute_move(self, move: ChessMove):
-
-        # Handle castling logic
-        if Piece.is_king(move.piece) and abs(move.start[1] - move.end[1]) == 2:
-            self.handle_castling(move.start, move.end)
-        
-        #en passant
-        self.handle_special_moves(move.piece, move.start, move.end)
-        self.update_board(move.start, move.end, move.piece)
+    def execute_move(self, move: ChessMove, detect_game_over=True):
+        self.push_move(move)
+        self.end_turn(detect_game_over)
 
-        # Update has_moved dictionary after update_move to get castling rights correct in history
-        piece_color = Piece.get_piece_color(move.piece)
-        if Piece.is_king(move.piece):
-            self.has_moved['K' if piece_color == Piece.White else 'k'] = True
-        elif Piece.is_rook(move.piece):
-            if move.start == (7, 0) or move.start == (0, 0):  # Queenside rook
-                self.has_moved['QR' if piece_color == Piece.White else 'qr'] = True
-            elif move.start == (7, 7) or move.start == (0, 7):  # Kingside rook
-                self.has_moved['KR' if piece_color == Piece.White else 'kr'] = True
-
-        # Record the move
-        self.end_turn()
-        
     def update_board(self, old_position, new_position, use_piece=None):
-        #Handle pawn promotion, only queen for now
-        piece = use_piece if use_piece is not None else self.board[old_position[0]][old_position[1]]
+        """
+        Moves a piece without handing the turn over, undo with undo_last_move.
+        """
+        piece = use_piece if use_piece is not None else self.board[old_position[0] * 8 + old_position[1]]
         if (piece == Piece.No_Piece):
             return
+        self.push_move(ChessMove(piece, old_position, new_position))
 
-        activePiece = piece
-        if (piece&7) == Piece.Pawn:
-            color = Piece.get_piece_color(piece)
-            if (new_position[0] == 0 and color == Piece.White):
-                #print ("Promoting pawn to queen at position ", new_position)
-                activePiece = Piece.WhiteQueen
-            elif (new_position[0] == 7 and color == Piece.Black):
-                #print ("Promoting pawn to queen at position ", new_position)
-                activePiece = Piece.BlackQueen
+    def execute_packed_move(self, code, detect_game_over=True):
+        """execute_move for a packed move (see chess_move.encode_move), its undo record holds the int."""
+        from_square = code & 63
+        to_square = (code >> 6) & 63
+        piece = (code >> PIECE_SHIFT) & 15
+        promotion = (code >> 12) & 7
+        self._push(code, piece, (from_square >> 3, from_square & 7), (to_square >> 3, to_square & 7),
+                   promotion | (piece & 8) if promotion else Piece.No_Piece)
+        self.end_turn(detect_game_over)
 
-        captured_piece = self.board[new_position[0]][new_position[1]]
-        move = ChessMove(piece, old_position, new_position, captured_piece)
+    def push_move(self, move: ChessMove):
+        """
+        Applies move in place and pushes a compact undo record onto move_history:
+        (move, has_moved, captured piece, captured position, en passant square, halfmove clock, game over flag).
+        Moves made by execute_packed_move are recorded as their packed int instead of a ChessMove. The move object itself is never modified, the same object may be made again further down a search.
+        """
+        self._push(move, move.piece, move.start, move.end, move.promotion)
 
-        if self.captured_en_passant is not None:
-            #print ("Adding en passant to move history")
-            move = ChessMove(piece, old_position, new_position, self.captured_en_passant, self.captured_en_passant_position)
-            move.is_en_passant = True
-            self.captured_en_passant = None
-            self.captured_en_passant_position = None
-            
-        elif (self.castling_rook_position_start is not None):
-            move.castle(self.board[self.castling_rook_position_start[0]][self.castling_rook_position_start[1]],self.castling_rook_position_start, self.castling_rook_position_end)
-            self.board[self.castling_rook_position_end[0]][self.castling_rook_position_end[1]] = self.board[self.castling_rook_position_start[0]][self.castling_rook_position_start[1]]
-            self.board[self.castling_rook_position_start[0]][self.castling_rook_position_start[1]] = Piece.No_Piece            
-            self.castling_rook_position_start = None
-            self.castling_rook_position_end = None
-            self.castling_rook = None        
-                
-            
-        self.move_history.append((move, self.has_moved.copy()))
-        #print (f"last move: {self.last_move}, placing active piece: {activePiece}")
-        self.board[new_position[0]][new_position[1]] = activePiece
-        self.board[old_position[0]][old_position[1]] = Piece.No_Piece
+    def _push(self, move, piece, start, end, promotion):
+        piece_type = piece & 7
+        captured_position = end
+        captured_piece = self.board[end[0] * 8 + end[1]]
+        if piece_type == Piece.Pawn and captured_piece == Piece.No_Piece and start[1] != end[1]:
+            # A pawn moving diagonally onto an empty square captures en passant, the captured pawn is beside it
+            captured_position = (start[0], end[1])
+            captured_piece = self.board[start[0] * 8 + end[1]]
+
+        self.move_history.append((move, self.has_moved, captured_piece, captured_position, self.en_passant_square, self.halfmove_clock, self.is_game_over))
+
+        if captured_piece != Piece.No_Piece:
+            self._remove_piece(captured_piece, captured_position)
+        self._remove_piece(piece, start)
+        if piece_type == Piece.Pawn and (end[0] == 0 or end[0] == 7):
+            self._add_piece(promotion if promotion != Piece.No_Piece else Piece.Queen | (piece & 8), end)
+        else:
+            self._add_piece(piece, end)
+
+        if piece_type == Piece.King and abs(end[1] - start[1]) == 2:
+            # Castling, the rook jumps to the square the king passed over
+            rook_start, rook_end = self.castling_rook_squares(start, end)
+            rook = Piece.Rook | (piece & 8)
+            self._remove_piece(rook, rook_start)
+            self._add_piece(rook, rook_end)
+
+        # has_moved is copy on write, the undo records share the dicts they saved
+        changed_rights = None
+        if piece_type == Piece.King:
+            changed_rights = ['K' if piece < Piece.Black else 'k']
+        if start in self.rook_corners:
+            changed_rights = (changed_rights or []) + [self.rook_corners[start]]
+        if end in self.rook_corners:
+            # Anything landing on a rook's home square has captured it, castling on that side is gone
+            changed_rights = (changed_rights or []) + [self.rook_corners[end]]
+        if changed_rights is not None and not all(self.has_moved[key] for key in changed_rights):
+            self._zobrist_hash ^= zobrist.CASTLING[zobrist.castling_index(self.has_moved)]
+            self.has_moved = self.has_moved.copy()
+            for key in changed_rights:
+                self.has_moved[key] = True
+            self._zobrist_hash ^= zobrist.CASTLING[zobrist.castling_index(self.has_moved)]
+
+        if self.en_passant_square is not None:
+            self._zobrist_hash ^= zobrist.EN_PASSANT_FILE[self.en_passant_square[1]]
+        if piece_type == Piece.Pawn and abs(end[0] - start[0]) == 2:
+            self.en_passant_square = ((start[0] + end[0]) // 2, start[1])
+            self._zobrist_hash ^= zobrist.EN_PASSANT_FILE[start[1]]
+        else:
+            self.en_passant_square = None
+        self.halfmove_clock = 0 if piece_type == Piece.Pawn or captured_piece != Piece.No_Piece else self.halfmove_clock + 1
+        if self.debug_hash:
+            self.verify_hash()
+
+    def make_null_move(self):
+        """
+        Hands the turn over without moving a piece, for null move pruning in the search. The undo record has None as
+        its move and undo_last_move takes it back like any other.
+        """
+        self.move_history.append((None, self.has_moved, Piece.No_Piece, None, self.en_passant_square, self.halfmove_clock, self.is_game_over))
+        if self.en_passant_square is not None:
+            self._zobrist_hash ^= zobrist.EN_PASSANT_FILE[self.en_passant_square[1]]
+            self.en_passant_square = None
+        self.halfmove_clock += 1
+        self.end_turn(detect_game_over=False)
 
     def undo_last_move(self):
         
         if (len(self.move_history) > 0):
-            last_move, has_moved = self.move_history.pop()
+            last_move, has_moved, captured_piece, captured_position, en_passant_square, halfmove_clock, is_game_over = self.move_history.pop()
             # print ("##### undoing last move", last_move)
-            self.has_moved = has_moved.copy()
-            self.board[last_move.end[0]][last_move.end[1]] = Piece.No_Piece # Clear the destination in case its not the same as captured position
-            self.board[last_move.captured_position[0]][last_move.captured_position[1]] = last_move.captured_piece
-            self.board[last_move.start[0]][last_move.start[1]] = last_move.piece
-            
-            if (last_move.is_castling_move):
-                self.board[last_move.rook_end[0]][last_move.rook_end[1]] = Piece.No_Piece
-                self.board[last_move.rook_start[0]][last_move.rook_start[1]] = last_move.rook
+            if last_move is None:
+                # Null move, only the turn changed hands
+                mover_color = Piece.get_opposite_color(self.current_player_color)
+            else:
+                if isinstance(last_move, int):
+                    # Packed move, made by execute_packed_move
+                    piece = (last_move >> PIECE_SHIFT) & 15
+                    start = ((last_move >> 3) & 7, last_move & 7)
+                    end = ((last_move >> 9) & 7, (last_move >> 6) & 7)
+                else:
+                    piece = last_move.piece
+                    start = last_move.start
+                    end = last_move.end
+                mover_color = piece & 8
+                self._remove_piece(self.board[end[0] * 8 + end[1]], end)  # differs from the moved piece after a promotion
+                if captured_piece != Piece.No_Piece:
+                    self._add_piece(captured_piece, captured_position)
+                self._add_piece(piece, start)
 
-            self.current_player_color = Piece.get_piece_color(last_move.piece)
+                if piece & 7 == Piece.King and abs(end[1] - start[1]) == 2:
+                    rook_start, rook_end = self.castling_rook_squares(start, end)
+                    rook = Piece.Rook | mover_color
+                    self._remove_piece(rook, rook_end)
+                    self._add_piece(rook, rook_start)
+
+            if has_moved is not self.has_moved:
+                self._zobrist_hash ^= zobrist.CASTLING[zobrist.castling_index(self.has_moved)] ^ zobrist.CASTLING[zobrist.castling_index(has_moved)]
+            self.has_moved = has_moved
+            if self.en_passant_square is not None:
+                self._zobrist_hash ^= zobrist.EN_PASSANT_FILE[self.en_passant_square[1]]
+            if en_passant_square is not None:
+                self._zobrist_hash ^= zobrist.EN_PASSANT_FILE[en_passant_square[1]]
+            self.en_passant_square = en_passant_square
+            self.halfmove_clock = halfmove_clock
+            self.is_game_over = is_game_over
+            if self.current_player_color != mover_color:
+                # The move handed the turn over through end_turn, take that back too
+                self.move_number[self.current_player_color] -= 1
+                self._zobrist_hash ^= zobrist.BLACK_TO_MOVE
+            self.current_player_color = mover_color
+            if self.debug_hash:
+                self.verify_hash()
         else:
             print ("No moves to undo")
 
     def end_game(self):
         self.is_game_over = True
 
-    def handle_castling(self, old_king_position, new_king_position):
-        #print ("Castling detected!")
+    def castling_rook_squares(self, old_king_position, new_king_position):
         direction = 1 if new_king_position[1] - old_king_position[1] > 0 else -1
         rook_old_col = 7 if direction == 1 else 0
         rook_new_col = new_king_position[1] - direction  # Rook moves to the adjacent column of the king's new position
-        rook_position = (old_king_position[0], rook_old_col)
-        new_rook_position = (new_king_position[0], rook_new_col)
-        self.castling_rook_position_start = rook_position
-        self.castling_rook_position_end = new_rook_position
-
-        # Move the rook, don't update history with update_board, since this will be recorded as one move later
-       
-        #self.update_board(rook_position, new_rook_position)
-
-    def handle_special_moves(self, piece: Piece, old_position, new_position):
-        if self.is_en_passant(piece, old_position, new_position):
-            self.remove_captured_pawn_en_passant(old_position, new_position)
-        else:
-            self.captured_en_passant = None
-            self.captured_en_passant_position = None
-
-    def is_en_passant(self, piece: Piece, old_position, new_position):
-        if (piece & 7) != Piece.Pawn:
-            return False
-        piece_color = Piece.get_piece_color(piece)
-        last_move = self.move_history[-1][0] if len(self.move_history) > 0 else None
-        if (last_move is None):
-            return False
-        if (last_move and abs(last_move.start[0] - last_move.end[0]) == 2):
-            if  piece_color == Piece.get_piece_color(last_move.piece):
-                return False
-
-        if piece_color == Piece.White:
-            expected_rank = last_move.end[0] - 1  # For white pawn, it should move to the rank just behind the black pawn
-        else:
-            expected_rank = last_move.end[0] + 1  # For black pawn, it should move to the rank just behind the white pawn
-
-        return abs(new_position[1] - old_position[1]) == 1 and new_position[0] == expected_rank
-
-    def remove_captured_pawn_en_passant(self, old_position, new_position):
-        # Use old_position[0] for the rank and new_position[1] for the file
-        captured_pawn_position = (old_position[0], new_position[1])
-        self.captured_en_passant = self.board[captured_pawn_position[0]][captured_pawn_position[1]]
-        self.captured_en_passant_position = captured_pawn_position
-        self.board[captured_pawn_position[0]][captured_pawn_position[1]] = Piece.No_Piece
-        #print("En passant capture detected and piece removed!")
+        return (old_king_position[0], rook_old_col), (new_king_position[0], rook_new_col)
 
+    def get_en_passant_square(self):
+        """
+        Returns the (row, col) square a pawn skipped over with a double step on the last move, or None.
+        """
+        return self.en_passant_square
 
     def take_piece_at_position(self, position, square_size):
         # Logic to get the piece at the given position
@@ -233,7 +342,7 @@ class BoardState:
         if (x < 0 or x > 7 or y < 0 or y > 7):
             self.current_valid_moves = None
             return None
-        piece = self.board[y][x]
+        piece = self.board[y * 8 + x]
         if (self.current_player_color != Piece.get_piece_color(piece)):
             print ("Not your turn")
             return Piece.No_Piece
@@ -244,38 +353,17 @@ class BoardState:
         self.current_valid_moves = moveGenerator.get_moves_for_piece((y,x), self) # ensure row,col format
         print ("IS BOARD IDENTICAL: ", self.compare_to_board(board_copy))
         # print (f"valid moves:{self.current_valid_moves}")
-        self.board[y][x] = Piece.No_Piece
+        self.board[y * 8 + x] = Piece.No_Piece
         return piece    
 
     def compare_to_board(self, board2):
-        for row in range(8):
-            for col in range(8):
-                if (self.board[row][col] != board2[row][col]):
-                    return False
-        return True
+        return self.board == board2
 
     def get_king_position(self, color):
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                piece_color = Piece.get_piece_color(piece)
-                if Piece.is_black_king(piece) and color == Piece.Black:
-                    return (row, col)
-                elif Piece.is_white_king(piece) and color == Piece.White:
-                    return (row, col)
-        return None  # King not found (shouldn't happen in a valid game state)
+        return self.king_positions[color]  # None if the king is missing (shouldn't happen in a valid game state)
         
     def get_all_pieces_positions_by_color(self, color):
-        pieces = []
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece == Piece.No_Piece:
-                    continue
-                if Piece.get_piece_color(piece) == color:
-                    #yield (row, col, piece)
-                    pieces.append((row, col, piece))
-        return pieces
+        return [(row, col, piece) for (row, col), piece in self.piece_positions[color].items()]
 
     
     def get_pawn_positions(self, color):
@@ -283,25 +371,35 @@ class BoardState:
             if Piece.is_pawn(piece):
                 yield (row, col)
     
-    def make_move(self, move):
-        self.execute_move(move)
+    def make_move(self, move, detect_game_over=True):
+        self.execute_move(move, detect_game_over)
         self.current_valid_moves = None
         # self.debug_print_board()
         
     def copy(self):
         # Create a new BoardState instance
-        new_board_state = BoardState()
+        new_board_state = BoardState(self.bitboards is not None)
         
         # Directly copy immutable and simple mutable objects
-        new_board_state.board = np.copy(self.board)  # Deep copy of the board array
+        new_board_state.board = bytearray(self.board)
         new_board_state.move_history = copy.deepcopy(self.move_history) if self.move_history is not None else None  # Deep copy with None check
         new_board_state.current_valid_moves = list(self.current_valid_moves) if self.current_valid_moves is not None else None  # Shallow copy with None check
         new_board_state.selected_piece_position = self.selected_piece_position  # Tuples are immutable, direct copy is fine
-        new_board_state.last_move = copy.deepcopy(self.last_move) if self.last_move is not None else None  # Deep copy with None check
+        new_board_state.last_double_move = copy.deepcopy(self.last_double_move) if self.last_double_move is not None else None  # Deep copy with None check
         new_board_state.has_moved = self.has_moved.copy() if self.has_moved is not None else None  # Shallow copy of the dictionary with None check
         new_board_state.current_player_color = self.current_player_color  # Immutable, direct copy is fine
         new_board_state.is_game_over = self.is_game_over
         new_board_state.move_number = self.move_number.copy()
+        new_board_state.en_passant_square = self.en_passant_square
+        new_board_state.halfmove_clock = self.halfmove_clock
+        new_board_state._zobrist_hash = self._zobrist_hash
+        new_board_state.midgame_score = self.midgame_score
+        new_board_state.endgame_score = self.endgame_score
+        new_board_state.phase = self.phase
+        new_board_state.piece_positions = {color: positions.copy() for color, positions in self.piece_positions.items()}
+        new_board_state.king_positions = self.king_positions.copy()
+        if self.bitboards is not None:
+            new_board_state.bitboards = self.bitboards.copy()
         return new_board_state    
     
     def print_board(self):
@@ -310,7 +408,7 @@ class BoardState:
         """
         print("  a b c d e f g h")
         print(" +-----------------+")
-        for i, row in enumerate(self.board):
-            print(f"{8 - i} | {' '.join(self.fen.get_fen_char_from_piece(piece) for piece in row)} | {8 - i}")
+        for i in range(8):
+            print(f"{8 - i} | {' '.join(self.fen.get_fen_char_from_piece(piece) for piece in self.board[i * 8:i * 8 + 8])} | {8 - i}")
         print(" +-----------------+")
         print("  a b c d e f g h")    
\ No newline at end of file
@@ -1,12 +1,9 @@
-import pygame
 from typing import Optional
-from board_drawer import BoardDrawer
+from background_search import BackgroundSearch
 from board_state import BoardState
-from chess_ai import ChessAI
 from chess_move import ChessMove
 from fen import FEN
 from move_generator import MoveGenerator
-from piece_drawer import PieceDrawer
 from piece import Piece
 
 class Chess:
@@ -22,32 +19,64 @@ class Chess:
     dragging = False    
     drag_position = None
     fen = FEN()
-    board_state = BoardState()
     selected_grid_position = None
-    board_surface = None
-    ai = ChessAI(4)
+    ai_color = None  # Color the AI plays against the human, None when nobody plays against it
+    # Flags or-ed onto the piece code of a square in drawn_squares
+    MOVE_MARKER = 1 << 4
+    HIGHLIGHT = 1 << 5
     
     def __init__(self, board_size):
+        # pygame and the drawers load here, importing this module does not pull in SDL
+        import pygame
+        from board_drawer import BoardDrawer
+        from piece_drawer import PieceDrawer
         print("Chess game initialized")
+        self.board_state = BoardState()
         self.board_size = board_size
         self.square_size = board_size // 8
         self.board_drawer = BoardDrawer(self.board_size, self.square_size)
         self.pieceDrawer = PieceDrawer("assets/pieces.png")
+        self.pieceDrawer.prepare((self.square_size, self.square_size))
+        # Squares, move markers and pieces composited, draw() only repaints the squares whose look changed
+        self.board_layer = pygame.Surface((self.board_size, self.board_size))
+        self.drawn_squares = None  # What every square of board_layer shows, None until the first draw
+        self.drawn_screen = None
+        self.drawn_drag = None  # (piece, rect) of the dragged piece on screen
+        # The AI thinks in its own process, update() picks its move up so the window never freezes
+        self.search = BackgroundSearch(16, movetime=1.0)
         self.reset_board()
 
     def reset_board(self):
+        self.search.cancel()
         self.board_state.reset_board()
+        self.resume_ai()
 
     def undo_last_move(self):
+        self.search.cancel()
         self.board_state.undo_last_move()
+        self.resume_ai()
+
+    def load(self):
+        """Loads the saved game, the search still running on the old position is dropped first."""
+        self.search.cancel()
+        self.board_state.load()
+        self.resume_ai()
+
+    def resume_ai(self):
+        """After the position was replaced under the AI, starts it thinking again if it is to move."""
+        if self.ai_color == self.board_state.current_player_color and not self.board_state.is_game_over:
+            self.do_next_ai_move()
 
     def pick_up_piece(self, mousePosition):
         if (self.dragging):
             print ("Already dragging a piece")
             return
+        if self.ai_color == self.board_state.current_player_color:
+            print ("AI is thinking")
+            return
         print ("##############################################")
         piece = self.board_state.take_piece_at_position(mousePosition, self.square_size)
-        if (piece is Piece.No_Piece):
+        if (piece == Piece.No_Piece):
             #will fail if not current players turn
             return
         
@@ -56,9 +85,9 @@ class Chess:
         mouseX, mouseY = mousePosition
         x = int(mouseX // self.square_size)
         y = int(mouseY // self.square_size)
-        self.selected_grid_position = (x, y) if self.selected_piece is not Piece.No_Piece else None    
+        self.selected_grid_position = (x, y) if self.selected_piece != Piece.No_Piece else None    
         self.drag_position = (x * self.square_size , y * self.square_size)
-        self.dragging = piece is not Piece.No_Piece and piece is not None
+        self.dragging = piece != Piece.No_Piece and piece is not None
 
     def get_square_location_from_position(self, position):
         posX, posY = position
@@ -68,7 +97,7 @@ class Chess:
         row,col = self.get_square_location_from_position(mousePosition)
         if (col < 0 or col > 7 or row < 0 or row > 7):
             return None
-        return self.board_state.board[row][col]
+        return self.board_state.board[row * 8 + col]
     
     def deselect_piece(self):
         self.selected_piece = None
@@ -86,13 +115,16 @@ class Chess:
         old_position = self.board_state.selected_piece_position
         if self.selected_piece and self.board_state.is_move_legal(new_position):
             print ("Executing move!")
-            self.board_state.make_move(ChessMove(self.selected_piece, old_position, new_position))
+            move = ChessMove(self.selected_piece, old_position, new_position)
+            self.board_state.make_move(move)
             self.deselect_piece()
-            #self.do_next_ai_move()
+            if self.ai_color == self.board_state.current_player_color and not self.board_state.is_game_over:
+                # Keeps the ponder search if it guessed this move, starts thinking from scratch otherwise
+                self.search.opponent_moved(move, self.board_state)
         else:
             print("Illegal move")
             row, col = self.board_state.selected_piece_position
-            self.board_state.board[row][col] = self.selected_piece
+            self.board_state.board[row * 8 + col] = self.selected_piece
             self.selected_piece = None
             self.dragging = False
             self.drag_position = None
@@ -132,24 +164,77 @@ class Chess:
     #         self.draw_dragged_piece(screen)
 
     def draw(self, screen, custom_board_state = None):
+        """
+        Brings screen up to date with the board and returns the rectangles that changed, for pygame.display.update.
+        Every square is described by its piece code plus MOVE_MARKER and HIGHLIGHT, read straight from the board
+        array, and only the squares whose description changed since the last call are redrawn. The dragged piece
+        floats on top, only the rectangles it left and entered are repainted. Nothing changed, nothing is drawn.
+        """
+        import pygame
         if (custom_board_state is None):
             custom_board_state = self.board_state
-        self.board_drawer.draw_board(screen)
-        self.board_drawer.draw_valid_moves(screen, custom_board_state.current_valid_moves)
-        # self.draw_board(screen)
-        self.draw_pieces_from_fen(screen, self.fen.board_state_to_fen(custom_board_state))
-        if (self.dragging):
-            self.board_drawer.highlight_square(screen, self.selected_grid_position)
-            self.draw_dragged_piece(screen)
+        squares = bytearray(custom_board_state.board)
+        if custom_board_state.current_valid_moves:
+            for move in custom_board_state.current_valid_moves:
+                row, col = move.end
+                squares[row * 8 + col] |= self.MOVE_MARKER
+        if self.dragging and self.selected_grid_position is not None:
+            x, y = self.selected_grid_position
+            squares[y * 8 + x] |= self.HIGHLIGHT
+        dragged = None
+        if self.dragging and self.drag_position is not None and self.selected_piece is not None:
+            dragged = (self.selected_piece, pygame.Rect(self.drag_position, (self.square_size, self.square_size)))
+
+        if screen is not self.drawn_screen:
+            # Nothing of ours is on this surface yet
+            self.drawn_screen = screen
+            self.drawn_squares = None
+            self.drawn_drag = None
+        drawn = self.drawn_squares
+        if drawn == squares and dragged == self.drawn_drag:
+            return []
+
+        dirty = []
+        size = self.square_size
+        layer = self.board_layer
+        for index in range(64):
+            look = squares[index]
+            if drawn is not None and drawn[index] == look:
+                continue
+            row, col = index >> 3, index & 7
+            rect = pygame.Rect(col * size, row * size, size, size)
+            self.board_drawer.draw_square(layer, row, col)
+            if look & self.MOVE_MARKER:
+                self.board_drawer.draw_valid_move_marker(layer, row, col)
+            if look & 15:
+                self.pieceDrawer.draw_piece(layer, look & 15, rect.topleft, (size, size))
+            if look & self.HIGHLIGHT:
+                self.board_drawer.highlight_square(layer, (col, row))
+            screen.blit(layer, rect, rect)
+            dirty.append(rect)
+        self.drawn_squares = squares
+
+        if self.drawn_drag is not None:
+            # Uncover what the dragged piece was hiding
+            rect = self.drawn_drag[1]
+            screen.blit(layer, rect, rect)
+            dirty.append(rect)
+        if dragged is not None:
+            self.pieceDrawer.draw_piece(screen, dragged[0], dragged[1].topleft, (size, size))
+            dirty.append(dragged[1])
+        self.drawn_drag = dragged
+        return dirty
 
     def update(self):
-        
+        best_move_tuple = self.search.poll()
+        if best_move_tuple is not None:
+            self.play_ai_move(best_move_tuple)
+
         # if (self.board_state.is_game_over or self.board_state.num_moves_without_capture() >= 50):
         #     self.board_state.reset_board()
         #     return
         # self.self_play()
         #self.random_play()
-        pass
 
     def random_play(self):
         move_generator = MoveGenerator()
@@ -161,30 +246,19 @@ class Chess:
             self.board_state.reset_board()
             return
         else:
-            self.board_state.make_move(rand_move.start, rand_move.end)        
+            self.board_state.make_move(rand_move)        
 
     def self_play(self):
-        move_generator = MoveGenerator()
-        best_move_tuple = self.ai.choose_best_move(self.board_state, self.board_state.current_player_color)
-        print(f"Best move: {best_move_tuple}")
-
-        if best_move_tuple[1] is None:
-            print("No best move found, making random move:")
-            
-            rand_move = move_generator.select_random_valid_move(self.board_state, self.board_state.current_player_color)
-            # If rand_move is None (no valid moves), handle that case as well
-            if rand_move is not None:
-                best_move_tuple = (best_move_tuple[0], ChessMove(0, rand_move.start, rand_move.end))
-            else:
-                print("No valid moves available.")
-                return 
-
-        self.board_state.make_move(best_move_tuple[1].start, best_move_tuple[1].end)
+        if not self.search.is_busy():
+            self.do_next_ai_move()
 
     def do_next_ai_move(self):
+        """Starts the search on the current position, update() plays the move when it is done."""
         print ("AI move")
+        self.search.start(self.board_state)
+
+    def play_ai_move(self, best_move_tuple):
         move_generator = MoveGenerator()
-        best_move_tuple = self.ai.choose_best_move(self.board_state, self.board_state.current_player_color)
         print(f"Best move: {best_move_tuple}")
 
         if best_move_tuple[1] is None:
@@ -193,12 +267,15 @@ class Chess:
             rand_move = move_generator.select_random_valid_move(self.board_state, self.board_state.current_player_color)
             # If rand_move is None (no valid moves), handle that case as well
             if rand_move is not None:
-                best_move_tuple = (best_move_tuple[0], ChessMove(0, rand_move.start, rand_move.end))
+                best_move_tuple = (best_move_tuple[0], rand_move)
             else:
                 print("No valid moves available.")
                 return 
 
-        self.board_state.make_move(best_move_tuple[1].start, best_move_tuple[1].end)
+        self.board_state.make_move(best_move_tuple[1])
+        if self.ai_color is not None and len(self.search.pv) > 1 and not self.board_state.is_game_over:
+            # Think on the reply we expect while the human is making up their mind
+            self.search.ponder(self.board_state, self.search.pv[1])
 
     def board_pos_to_screen_pos(self, row, col):
         """
@@ -215,33 +292,3 @@ class Chess:
         screen_x = col * self.square_size + self.square_size / 2  # Center in square
         screen_y = row * self.square_size + self.square_size / 2  # Center in square
         return screen_x, screen_y
-
-    def draw_valid_moves(self, screen):
-        if self.board_state.current_valid_moves:
-            temp_surface = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-            radius = self.square_size // 4
-            for move in self.board_state.current_valid_moves:
-                row, col = move
-                screen_x, screen_y = self.board_pos_to_screen_pos(row, col)
-                pygame.draw.circle(temp_surface, self.VALID_MOVE_COLOR, (int(screen_x), int(screen_y)), radius)
-            screen.blit(temp_surface, (0, 0))
-
-    def draw_pieces_from_fen(self, screen, fen):
-            placement = fen.split()[0]
-            rows = placement.split('/')
-            
-            for j, row in enumerate(rows):
-                i = 0
-                for char in row:
-                    if char.isdigit():
-                        # Skip empty squares
-                        i += int(char)
-                    else:
-                        piece = self.fen.get_piece_from_fen_char(char)
-                        if piece:
-                            x = i * self.square_size
-                            y = j * self.square_size
-                            self.pieceDrawer.draw_piece(screen, piece, (x, y), (self.square_size, self.square_size))
-                        i += 1
-
-       
\ No newline at end of file
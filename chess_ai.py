@@ -1,54 +1,335 @@
+import time
 from board_evaluator import BoardEvaluator
+from chess_move import CAPTURED_SHIFT, MOVE_KEY_MASK, ChessMove, move_buffers
 from move_generator import MoveGenerator
+from move_ordering import MoveOrderer
 from piece import Piece  # Assuming Piece class contains color definitions
+from transposition_table import TranspositionTable, pack_move
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when the time budget runs out or stop() is called."""
+
 
 class ChessAI:
-    def __init__(self, max_depth):
+    INFINITY = 1000000
+    # A mate in n plies from the root scores MATE_SCORE - n, anything beyond MATE_BOUND is a mate
+    MATE_SCORE = 100000
+    MATE_BOUND = MATE_SCORE - 1000
+    # Safety margin kept on the clock and the share of it spent on one move when no movetime is given
+    clock_margin = 0.05
+    moves_to_go = 30
+    # A new iteration is only started while less than this share of the budget is used, it would rarely finish otherwise
+    soft_limit = 0.5
+    # Safety margin in centipawns for delta pruning in the quiescence search
+    delta_margin = 200
+    # Pruning switches and parameters, turn them off to measure what they save (see nodes_per_ply and iterations)
+    use_null_move = True
+    null_move_reduction = 2
+    use_late_move_reductions = True
+    lmr_min_depth = 3
+    lmr_full_depth_moves = 4
+    lmr_deep_reduction_moves = 12
+
+    def __init__(self, max_depth, hash_size_mb=16, movetime=None):
         self.max_depth = max_depth
+        self.movetime = movetime
+        self.move_generator = MoveGenerator()
+        self.evaluator = BoardEvaluator()
+        self.move_orderer = MoveOrderer()
+        # The search generates packed moves, into the buffer of the ply it is at
+        self.move_buffers = move_buffers(MoveOrderer.MAX_PLY)
+        self.transposition_table = TranspositionTable(hash_size_mb)
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.nodes_per_ply = []
+        self.null_move_cutoffs = 0
+        self.reductions = 0
+        self.re_searches = 0
+        self.deadline = None
+        self.can_abort = False
+        self.stop_requested = False
+        self.pv = []
+        self.follow_pv = False
+        self.iterations = []
+
+    def allocate_time(self, movetime=None, clock=None, increment=0, moves_to_go=None):
+        """Seconds to spend on this move, None when there is no limit."""
+        if movetime is not None:
+            return movetime
+        if clock is None:
+            return self.movetime
+        budget = clock / (moves_to_go or self.moves_to_go) + increment * 0.75
+        return max(0.0, min(budget, clock - self.clock_margin))
+
+    def stop(self):
+        """Aborts a running search, which then returns the result of its last completed iteration."""
+        self.stop_requested = True
+
+    def search(self, board_state, color=None, movetime=None, clock=None, increment=0, moves_to_go=None, on_iteration=None, infinite=False):
+        """
+        Iterative deepening up to max_depth within the time budget (see allocate_time). Returns (score, move) of the
+        deepest completed iteration, the score from color's point of view. The first iteration always completes
+        so there is a move to play.
+        on_iteration is called with a dict describing each completed iteration. An infinite search ignores every
+        time limit and only ends at max_depth or when stop() is called.
+        """
+        if color is None:
+            color = board_state.current_player_color
+        budget = None if infinite else self.allocate_time(movetime, clock, increment, moves_to_go)
+        start_time = time.perf_counter()
+        history_length = len(board_state.move_history)
+        configured_depth = self.max_depth
+        self.can_abort = False
+        self.deadline = None if budget is None else start_time + budget
+        self.pv = []
+        self.iterations = []
+        self.move_orderer.new_search()
+        total_nodes = 0
+        result = None, None
+        try:
+            for depth in range(1, configured_depth + 1):
+                self.max_depth = depth
+                self.follow_pv = True
+                try:
+                    score, move = self.choose_best_move(board_state, color)
+                except SearchAborted:
+                    # Unwind the moves the aborted iteration left on the board
+                    while len(board_state.move_history) > history_length:
+                        board_state.undo_last_move()
+                    break
+                result = score, move
+                elapsed = time.perf_counter() - start_time
+                total_nodes += self.nodes
+                self.pv = self.principal_variation(board_state, depth)
+                # nodes is this iteration's count, total_nodes goes with time for the whole search so far
+                info = {
+                    'depth': depth, 'score': score, 'nodes': self.nodes, 'total_nodes': total_nodes, 'time': elapsed, 'pv': self.pv,
+                    'quiescence_nodes': self.quiescence_nodes, 'nodes_per_ply': self.nodes_per_ply,
+                    'null_move_cutoffs': self.null_move_cutoffs, 'reductions': self.reductions, 're_searches': self.re_searches,
+                    'cutoff_stats': self.move_orderer.cutoff_stats(),
+                }
+                self.iterations.append(info)
+                if on_iteration is not None:
+                    on_iteration(info)
+                if move is None or self.stop_requested:
+                    break
+                if budget is not None and elapsed >= budget * self.soft_limit:
+                    break
+                self.can_abort = True
+        finally:
+            self.max_depth = configured_depth
+            self.can_abort = False
+            self.deadline = None
+            # Cleared at the end rather than the start, a stop() that comes before the search got going still counts
+            self.stop_requested = False
+        return result
+
+    def principal_variation(self, board_state, max_length):
+        """Follows the stored best moves from the current position, playing them to check they are still legal."""
+        pv = []
+        seen = set()
+        try:
+            while len(pv) < max_length:
+                key = board_state.zobrist_hash
+                entry = self.transposition_table.probe(key)
+                if entry is None or not entry[3] or key in seen:
+                    break
+                seen.add(key)
+                buffer = self.move_buffers[len(pv)]
+                count = self.move_generator.get_packed_moves(board_state, board_state.current_player_color, buffer)
+                move = next((buffer[index] for index in range(count) if buffer[index] & MOVE_KEY_MASK == entry[3]), None)
+                if move is None:
+                    break
+                pv.append(ChessMove.from_packed(move))
+                board_state.execute_packed_move(move, detect_game_over=False)
+        finally:
+            for _ in pv:
+                board_state.undo_last_move()
+        return pv
+
+    def choose_best_move(self, board_state, color, alpha=-INFINITY, beta=INFINITY):
+        """
+        Searches max_depth plies in place on board_state with make/undo, the position is unchanged when this returns.
+        Returns (score, move) with the score from color's point of view.
+        """
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.nodes_per_ply = [0] * (self.max_depth + 1)
+        # Per iteration like the node counts, so each info reports the cutoff rates of its own depth
+        self.move_orderer.clear_stats()
+        self.null_move_cutoffs = 0
+        self.reductions = 0
+        self.re_searches = 0
+        score, move = self.negamax(board_state, color, self.max_depth, 0, alpha, beta)
+        return score, None if move is None else ChessMove.from_packed(move)
+
+    def negamax(self, board_state, color, depth, ply, alpha, beta, allow_null=True):
+        """
+        Principal variation search: the first move gets the full window, the others a null window around alpha and
+        are searched again only when they beat it. Scores are from color's point of view, the move is packed.
+        """
+        if depth <= 0:
+            return self.quiescence(board_state, color, alpha, beta, ply), None
+        self.nodes += 1
+        self.nodes_per_ply[ply] += 1
+        self.check_time()
+
+        pv_node = beta - alpha > 1
+        key = board_state.zobrist_hash
+        hash_move = 0
+        entry = self.transposition_table.probe(key)
+        if entry is not None:
+            entry_depth, score, bound, hash_move = entry
+            # The root always searches, it has to hand back a move, and PV nodes search to keep the line intact
+            if ply > 0 and not pv_node and entry_depth >= depth:
+                score = self.score_from_table(score, ply)
+                if (bound == TranspositionTable.EXACT
+                        or (bound == TranspositionTable.LOWER_BOUND and score >= beta)
+                        or (bound == TranspositionTable.UPPER_BOUND and score <= alpha)):
+                    return score, None
+        if self.follow_pv:
+            # Still on the previous iteration's principal variation, its move goes first
+            self.follow_pv = ply < len(self.pv)
+            if self.follow_pv:
+                hash_move = pack_move(self.pv[ply])
+
+        opponent_color = Piece.get_opposite_color(color)
+        in_check = self.move_generator.is_king_in_check(color, board_state.get_king_position(color), board_state)
+
+        # Null move: if the opponent moving twice in a row still leaves us above beta, a real move will too.
+        # Not in pawn endings, where having to move is often what loses (zugzwang)
+        if (allow_null and self.use_null_move and not pv_node and not in_check and depth > self.null_move_reduction
+                and self.has_non_pawn_material(board_state, color)):
+            board_state.make_null_move()
+            score = -self.negamax(board_state, opponent_color, depth - 1 - self.null_move_reduction, ply + 1, -beta, -beta + 1, False)[0]
+            board_state.undo_last_move()
+            if score >= beta:
+                self.null_move_cutoffs += 1
+                # A mate found after passing is not a real one
+                return (beta if score >= self.MATE_BOUND else score), None
 
-    def choose_best_move(self, board_state, color, depth=0, alpha=float('-inf'), beta=float('inf')):
-        evaluator = BoardEvaluator()
-        if depth == self.max_depth or board_state.is_game_over:
-            return evaluator.evaluate(board_state, color), None
-        if color == Piece.White:  # Assuming White is maximizing
-            return self.maximize(board_state, color, depth, alpha, beta)
-        else:  # Assuming Black is minimizing
-            return self.minimize(board_state, color, depth, alpha, beta)
-
-    def maximize(self, board_state, color, depth, alpha, beta):
-        max_score = float('-inf')
+        moves = self.ordered_moves(board_state, color, ply, hash_move)
+        if not moves:
+            return (-self.MATE_SCORE + ply if in_check else 0), None
+
+        original_alpha = alpha
+        best_score = -self.INFINITY
         best_move = None
-        for move in MoveGenerator().get_all_moves(board_state, color):
-            board_state_copy = board_state.copy()
-            board_state_copy.update_board(move.start, move.end)
-            # Switch to the opponent's color for the next depth level
-            opponent_color = Piece.Black if color == Piece.White else Piece.White
-            score = self.choose_best_move(board_state_copy, opponent_color, depth + 1, alpha, beta)[0]
-
-            if score > max_score:
-                max_score = score
+        for index, move in enumerate(moves):
+            # Neither a capture nor a promotion
+            quiet = not move >> CAPTURED_SHIFT and not (move >> 12) & 7
+            board_state.execute_packed_move(move, detect_game_over=False)
+            if index == 0:
+                score = -self.negamax(board_state, opponent_color, depth - 1, ply + 1, -beta, -alpha)[0]
+            else:
+                reduction = 0
+                # Late quiet moves are rarely best with good ordering, they get a shallower null window search first
+                if (self.use_late_move_reductions and quiet and not in_check and depth >= self.lmr_min_depth
+                        and index >= self.lmr_full_depth_moves
+                        and not self.move_generator.is_king_in_check(opponent_color, board_state.get_king_position(opponent_color), board_state)):
+                    reduction = 1 if index < self.lmr_deep_reduction_moves else 2
+                    self.reductions += 1
+                score = -self.negamax(board_state, opponent_color, depth - 1 - reduction, ply + 1, -alpha - 1, -alpha)[0]
+                if score > alpha and reduction:
+                    score = -self.negamax(board_state, opponent_color, depth - 1, ply + 1, -alpha - 1, -alpha)[0]
+                if alpha < score < beta:
+                    self.re_searches += 1
+                    score = -self.negamax(board_state, opponent_color, depth - 1, ply + 1, -beta, -alpha)[0]
+            board_state.undo_last_move()
+
+            if score > best_score:
+                best_score = score
                 best_move = move
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    self.move_orderer.record_cutoff(move, ply, depth, index)
+                    break
+
+        if best_score <= original_alpha:
+            bound = TranspositionTable.UPPER_BOUND
+        elif best_score >= beta:
+            bound = TranspositionTable.LOWER_BOUND
+        else:
+            bound = TranspositionTable.EXACT
+        self.transposition_table.store(key, depth, self.score_to_table(best_score, ply), bound, best_move & MOVE_KEY_MASK)
+        return best_score, best_move
+
+    def quiescence(self, board_state, color, alpha, beta, ply):
+        """
+        Extends a leaf through captures and promotions until the position is quiet, negamax style: the score is from
+        color's point of view. The side to move may stand pat on the static evaluation unless it is in check,
+        then every evasion is searched. Captures that cannot bring the score up to alpha are skipped (delta pruning).
+        """
+        self.nodes += 1
+        self.quiescence_nodes += 1
+        self.check_time()
+        opponent_color = Piece.get_opposite_color(color)
+        if ply >= MoveOrderer.MAX_PLY:
+            # Out of move buffers, only reachable from a search close to MAX_PLY deep
+            return self.evaluator.evaluate(board_state, color)
+        in_check = self.move_generator.is_king_in_check(color, board_state.get_king_position(color), board_state)
+        buffer = self.move_buffers[ply]
+        if in_check:
+            count = self.move_generator.get_packed_moves(board_state, color, buffer)
+            if not count:
+                return -self.MATE_SCORE + ply
+            best_score = -self.INFINITY
+        else:
+            stand_pat = self.evaluator.evaluate(board_state, color)
+            if stand_pat >= beta:
+                return stand_pat
+            # Not even winning a queen would get back to alpha
+            if stand_pat + self.evaluator.piece_values[Piece.Queen] + self.delta_margin < alpha:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            best_score = stand_pat
+            count = self.move_generator.get_packed_moves(board_state, color, buffer, captures_only=True)
+
+        for move in self.move_orderer.order_moves(buffer, count, ply):
+            if not in_check and not (move >> 12) & 7:
+                if stand_pat + self.evaluator.piece_values[(move >> CAPTURED_SHIFT) & 7] + self.delta_margin < alpha:
+                    continue
+            board_state.execute_packed_move(move, detect_game_over=False)
+            score = -self.quiescence(board_state, opponent_color, -beta, -alpha, ply + 1)
+            board_state.undo_last_move()
+
+            if score > best_score:
+                best_score = score
             alpha = max(alpha, score)
-            if beta <= alpha:
-                break  # Alpha-Beta Pruning
+            if alpha >= beta:
+                break
 
-        return max_score, best_move
-    
-    def minimize(self, board_state, color, depth, alpha, beta):
-        min_score = float('inf')
-        best_move = None
-        for move in MoveGenerator().get_all_moves(board_state, color):
-            board_state_copy = board_state.copy()
-            board_state_copy.update_board(move.start, move.end)
-            # Switch to the opponent's color for the next depth level
-            opponent_color = Piece.Black if color == Piece.White else Piece.White
-            score = self.choose_best_move(board_state_copy, opponent_color, depth + 1, alpha, beta)[0]
-
-            if score < min_score:
-                min_score = score
-                best_move = move
-            beta = min(beta, score)
-            if beta <= alpha:
-                break  # Alpha-Beta Pruning
+        return best_score
+
+    def has_non_pawn_material(self, board_state, color):
+        for piece in board_state.piece_positions[color].values():
+            if piece & 7 != Piece.Pawn and piece & 7 != Piece.King:
+                return True
+        return False
+
+    def score_to_table(self, score, ply):
+        # Mate scores count plies from the root, the table stores them counted from the node so they can be reused anywhere
+        if score >= self.MATE_BOUND:
+            return score + ply
+        if score <= -self.MATE_BOUND:
+            return score - ply
+        return score
+
+    def score_from_table(self, score, ply):
+        if score >= self.MATE_BOUND:
+            return score - ply
+        if score <= -self.MATE_BOUND:
+            return score + ply
+        return score
+
+    def check_time(self):
+        if self.can_abort and (self.stop_requested or (self.deadline is not None and time.perf_counter() >= self.deadline)):
+            raise SearchAborted()
 
-        return min_score, best_move
+    def ordered_moves(self, board_state, color, ply, hash_move):
+        self.move_orderer.record_node(ply)
+        buffer = self.move_buffers[ply]
+        count = self.move_generator.get_packed_moves(board_state, color, buffer)
+        return self.move_orderer.order_moves(buffer, count, ply, hash_move)
@@ -1,8 +1,40 @@
 from piece import Piece
 
+# Pieces a pawn may promote to, best first
+PROMOTION_TYPES = (Piece.Queen, Piece.Knight, Piece.Rook, Piece.Bishop)
+
+# Packed moves, the search and perft work on these plain ints instead of ChessMove objects:
+#   bits  0-5   from square (row * 8 + col)
+#   bits  6-11  to square
+#   bits 12-14  promotion piece type, 0 when the move does not promote
+#   bit  15     en passant capture
+#   bit  16     castling
+#   bits 17-20  moving piece
+#   bits 21-24  captured piece
+# The low 15 bits are the key the TranspositionTable stores (see transposition_table.pack_move).
+MOVE_KEY_MASK = 0x7FFF
+FLAG_EN_PASSANT = 1 << 15
+FLAG_CASTLING = 1 << 16
+PIECE_SHIFT = 17
+CAPTURED_SHIFT = 21
+# A position has at most 218 legal moves
+MAX_MOVES = 256
+
+
+def encode_move(piece, from_square, to_square, captured_piece=Piece.No_Piece, promotion=Piece.No_Piece, flags=0):
+    return from_square | to_square << 6 | (promotion & 7) << 12 | flags | piece << PIECE_SHIFT | captured_piece << CAPTURED_SHIFT
+
+
+def move_buffers(plies):
+    """One preallocated list of MAX_MOVES packed moves per ply, generators write into them by index."""
+    return [[0] * MAX_MOVES for _ in range(plies)]
+
+
 class ChessMove:
     is_castling_move = False
     is_en_passant = False
+    # The piece a pawn reaching the last rank becomes, No_Piece promotes to a queen
+    promotion = Piece.No_Piece
     def __init__(self, piece:Piece, start, end, captured_piece=Piece.No_Piece, captured_position=None):
         self.piece = piece
         self.start = start
@@ -15,6 +47,40 @@ class ChessMove:
         self.rook = rook
         self.rook_start = start
         self.rook_end = end
+
+    def promote(self, piece:Piece):
+        self.promotion = piece
+        return self
+
+    @classmethod
+    def from_packed(cls, code):
+        """The ChessMove a packed move stands for, made only where a move object is needed (UI, history, save files)."""
+        from_square = code & 63
+        to_square = (code >> 6) & 63
+        piece = (code >> PIECE_SHIFT) & 15
+        start = (from_square >> 3, from_square & 7)
+        end = (to_square >> 3, to_square & 7)
+        if code & FLAG_EN_PASSANT:
+            move = cls(piece, start, end, (code >> CAPTURED_SHIFT) & 15, (start[0], end[1]))
+            move.is_en_passant = True
+        else:
+            move = cls(piece, start, end, (code >> CAPTURED_SHIFT) & 15)
+        if code & FLAG_CASTLING:
+            kingside = end[1] > start[1]
+            move.castle(Piece.Rook | (piece & 8), (start[0], 7 if kingside else 0), (start[0], 5 if kingside else 3))
+        if (code >> 12) & 7:
+            move.promote((code >> 12) & 7 | (piece & 8))
+        return move
+
+    def pack(self):
+        """The move as a packed int, see encode_move."""
+        flags = 0
+        if self.is_en_passant or (self.piece & 7 == Piece.Pawn and self.captured_position != self.end):
+            flags = FLAG_EN_PASSANT
+        elif self.piece & 7 == Piece.King and abs(self.end[1] - self.start[1]) == 2:
+            flags = FLAG_CASTLING
+        return encode_move(self.piece, self.start[0] * 8 + self.start[1], self.end[0] * 8 + self.end[1],
+                           self.captured_piece, self.promotion, flags)
         
     def to_chess_notation(row, col):
         # Mapping for columns: 0 -> 'a', 1 -> 'b', ..., 7 -> 'h'
@@ -31,3 +97,27 @@ class ChessMove:
 
     def __repr__(self):
         return f"ChessMove {self.piece} from {self.start} to {self.end}, captured: {self.captured_piece} at {self.captured_position}, is_castling_move: {self.is_castling_move}"
+
+
+def square_name(position):
+    return ChessMove.to_chess_notation(*position)
+
+
+PROMOTION_LETTERS = {Piece.No_Piece: 'q', Piece.Queen: 'q', Piece.Rook: 'r', Piece.Bishop: 'b', Piece.Knight: 'n'}
+
+
+def move_to_uci(move):
+    """The move in UCI notation (e.g. e2e4, e7e8q), as the UCI front end and perft --divide write it."""
+    text = square_name(move.start) + square_name(move.end)
+    if move.piece & 7 == Piece.Pawn and move.end[0] in (0, 7):
+        text += PROMOTION_LETTERS[move.promotion & 7]
+    return text
+
+
+def uci_to_move(board_state, text):
+    """The legal move of board_state written as text (e.g. e2e4, e7e8q), None when there is none."""
+    from move_generator import MoveGenerator
+    for move in MoveGenerator().get_all_moves(board_state, board_state.current_player_color):
+        if move_to_uci(move) == text:
+            return move
+    return None
@@ -0,0 +1,35 @@
+"""
+Random games for the benchmarks and tests that need a corpus of positions or games, one seeded game loop for all
+of them instead of one per module.
+"""
+import random
+from board_state import BoardState
+from chess_move import MAX_MOVES
+from move_generator import MoveGenerator
+
+
+def random_playouts(seed=0, max_plies=80, board_state=None):
+    """
+    Endless random games from the starting position. Every move is made on board_state (a new BoardState by
+    default) and yielded packed, board_state holding the position after it. A game ends when the side to move has
+    no legal move or after max_plies, None is yielded on its final position, then its moves are taken back and the
+    next game starts.
+    """
+    rng = random.Random(seed)
+    move_generator = MoveGenerator()
+    if board_state is None:
+        board_state = BoardState()
+    buffer = [0] * MAX_MOVES
+    while True:
+        plies = 0
+        while plies < max_plies:
+            count = move_generator.get_packed_moves(board_state, board_state.current_player_color, buffer)
+            if not count:
+                break
+            move = buffer[rng.randrange(count)]
+            board_state.execute_packed_move(move, detect_game_over=False)
+            plies += 1
+            yield move
+        yield None
+        for _ in range(plies):
+            board_state.undo_last_move()
@@ -1,6 +1,54 @@
-import numpy as np
+import argparse
+import time
+from functools import lru_cache
 from piece import Piece
 
+# Piece code -> FEN letter, ' ' for an empty square
+PIECE_CHARS = ' PNBRQK  pnbrqk '
+# Piece code -> FEN letter as a bytes.translate table, with '.' for empty squares so runs of them can be counted
+_PLACEMENT_CHARS = bytes(ord(PIECE_CHARS[code]) if PIECE_CHARS[code] != ' ' else ord('.') for code in range(16)) + bytes(240)
+# Runs of empty squares, longest first, as they are written in FEN
+_EMPTY_RUNS = [('.' * count, str(count)) for count in range(8, 0, -1)]
+# FEN text -> piece codes: digits expand to that many '.' (str.translate), then every character becomes its code
+# (bytes.translate), anything that is not a piece letter, '.' or '/' becomes _BAD_SQUARE
+_EXPAND_EMPTY = str.maketrans({str(count): '.' * count for count in range(1, 9)})
+_BAD_SQUARE = 0xFF
+_PIECE_CODES = bytes(PIECE_CHARS.index(chr(char)) if chr(char) in 'PNBRQKpnbrqk' else 0 if char == ord('.') else _BAD_SQUARE
+                     for char in range(256))
+# Castling letter -> has_moved keys (king, rook) that must be False for it
+CASTLING_KEYS = {'K': ('K', 'KR'), 'Q': ('K', 'QR'), 'k': ('k', 'kr'), 'q': ('k', 'qr')}
+FILES = 'abcdefgh'
+
+
+@lru_cache(maxsize=4096)
+def parse_fen(fen):
+    """
+    Parses fen into (board, color, unmoved, en passant square, halfmove clock, fullmove number): board holds the 64
+    piece codes as bytes (row * 8 + col), unmoved the has_moved keys the castling rights keep False and the en
+    passant square is (row, col) or None. Missing fields get their defaults. Raises ValueError on a bad placement.
+    Cached, so positions that are loaded again and again (every root move task of a parallel search) parse once.
+    """
+    fields = fen.split()
+    placement = fields[0] if fields else ''
+    expanded = placement.translate(_EXPAND_EMPTY)
+    if len(expanded) != 71 or expanded[8::9] != '///////':
+        raise ValueError(f"Bad FEN piece placement: {placement!r}")
+    board = expanded.encode('ascii').translate(_PIECE_CODES, b'/')
+    if _BAD_SQUARE in board:
+        raise ValueError(f"Bad FEN piece placement: {placement!r}")
+
+    color = Piece.Black if len(fields) > 1 and fields[1] == 'b' else Piece.White
+    castling = fields[2] if len(fields) > 2 else '-'
+    unmoved = tuple(sorted({key for letter in castling for key in CASTLING_KEYS.get(letter, ())}))
+    en_passant = fields[3] if len(fields) > 3 else '-'
+    if len(en_passant) == 2 and en_passant[0] in FILES and en_passant[1] in '36':
+        en_passant_square = (8 - int(en_passant[1]), FILES.index(en_passant[0]))
+    else:
+        en_passant_square = None
+    halfmove_clock = int(fields[4]) if len(fields) > 4 and fields[4].isdigit() else 0
+    fullmove_number = int(fields[5]) if len(fields) > 5 and fields[5].isdigit() else 1
+    return board, color, unmoved, en_passant_square, halfmove_clock, fullmove_number
+
 
 class FEN:
     """
@@ -41,7 +89,6 @@ class FEN:
     fen_position_4_2 = "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1 "
     fen_position_5 = "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"
     fen_position_6 = "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"
-    #"rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
     initial_board_configuration = standard_game
     initial_castling_availability = "KQkq"
     def __init__(self):
@@ -51,153 +98,139 @@ class FEN:
         """
         Returns the piece constant from the Piece class based on the FEN character.
         """
-        if char.isupper():  # White pieces
-            color = Piece.White
-        else:  # Black pieces
-            color = Piece.Black
-        
-        piece_type = {
-            'P': Piece.Pawn,
-            'N': Piece.Knight,
-            'B': Piece.Bishop,
-            'R': Piece.Rook,
-            'Q': Piece.Queen,
-            'K': Piece.King
-        }.get(char.upper(), None)
-
-        if piece_type is not None:
-            return piece_type | color
-        return Piece.No_Piece
+        code = PIECE_CHARS.find(char) if char.strip() else -1
+        return code if code > 0 else Piece.No_Piece
     
     def get_fen_char_from_piece(self, piece: Piece):
         """
-        Returns the FEN character based on the piece constant from the Piece class.
+        Returns the FEN character based on the piece constant from the Piece class, ' ' for an empty square.
         """
-        if piece == Piece.No_Piece:
-            return ' '        
-        
-        piece_type = piece & 7  # Extract piece type
-        color = piece & 8  # Extract piece color
-        piece_types = {
-            Piece.Pawn: 'P',
-            Piece.Knight: 'N',
-            Piece.Bishop: 'B',
-            Piece.Rook: 'R',
-            Piece.Queen: 'Q',
-            Piece.King: 'K'
-        }
-        colors = {
-            Piece.White: 'w',
-            Piece.Black: 'b'
-        }
-        return piece_types.get(piece_type, ' ') if color == Piece.White else piece_types.get(piece_type, ' ').lower()        
+        return PIECE_CHARS[piece & 15]
     
     def fen_to_board_state(self, fen, board_state):
         """
         Parses the FEN string and updates the corresponding board configuration, 
         castling availability, active color, en passant target, halfmove clock, and fullmove counter.
         """
-        parts = fen.split(' ')
-        while len(parts) < 6:
-            if len(parts) == 1:
-                parts.extend(['w', '-', '-', '0', '1'])  # Default values for missing parts
-            else:
-                parts.append('-')
-
-        board_config, active_color, castling_avail, en_passant, halfmove_clock, fullmove_number = parts[0:6]
-
-        # Parse board configuration
-        board = board_state.board
-        board[:] = Piece.No_Piece
-        rows = board_config.split('/')
-        for i, row in enumerate(rows):
-            col = 0
-            for char in row:
-                if char.isdigit():
-                    col += int(char)
-                else:
-                    board[i, col] = self.get_piece_from_fen_char(char)
-                    col += 1
-
-        # Parse active color
-        board_state.current_player_color = Piece.White if active_color == 'w' else Piece.Black
-
-        # Reset castling availability
-        board_state.has_moved = {key: True for key in board_state.has_moved}
-
-        # Update castling availability based on FEN
-        if 'K' in castling_avail:
-            board_state.has_moved['KR'] = False
-            board_state.has_moved['K'] = False
-        if 'Q' in castling_avail:
-            board_state.has_moved['QR'] = False
-            board_state.has_moved['K'] = False
-        if 'k' in castling_avail:
-            board_state.has_moved['kr'] = False
-            board_state.has_moved['k'] = False
-        if 'q' in castling_avail:
-            board_state.has_moved['qr'] = False
-            board_state.has_moved['k'] = False
-
-        # Validate king and rook positions if no castling rights are supplied
-        # self.validate_king_rook_positions_for_castling(board, board_state, castling_avail)
-
-        # Parse en passant target square
-        # For now, it's just acknowledged and not utilized
-        # board_state.en_passant_target = en_passant
-
-        # Parse halfmove clock and fullmove number
-        if (halfmove_clock.isdigit() and fullmove_number.isdigit()):
-            board_state.halfmove_clock = int(halfmove_clock)
-            board_state.move_number[Piece.White] = int(fullmove_number) - 1
-            board_state.move_number[Piece.Black] = int(fullmove_number) - 1
-
+        board, color, unmoved, en_passant_square, halfmove_clock, fullmove_number = parse_fen(fen)
+        board_state.board[:] = board
+        board_state.current_player_color = color
+        board_state.has_moved = {key: key not in unmoved for key in board_state.has_moved}
+        board_state.en_passant_square = en_passant_square
+        board_state.halfmove_clock = halfmove_clock
+        # move_number counts the turns each side has been given, White's goes up with every Black move
+        board_state.move_number[Piece.White] = fullmove_number - 1
+        board_state.move_number[Piece.Black] = fullmove_number if color == Piece.Black else fullmove_number - 1
+        board_state.rebuild_from_board()
 
     def board_state_to_fen(self, board_state):
-        # Piece placement
-        board = board_state.board
-        fen = ''
-        empty_count = 0
-        for row in board:
-            for piece in row:
-                if piece == Piece.No_Piece:
-                    empty_count += 1
-                else:
-                    if empty_count > 0:
-                        fen += str(empty_count)
-                        empty_count = 0
-                    fen += self.get_fen_char_from_piece(piece)
-            if empty_count > 0:
-                fen += str(empty_count)
-                empty_count = 0
-            fen += '/'
-        fen = fen[:-1]  # Remove the last '/'
-        
-        # Active color
-        if board_state.current_player_color == Piece.White:
-            fen += ' w'
-        else:
-            fen += ' b'
-        
-        # Castling availability
-        castling = ''
-        castling += 'K' if board_state.has_moved['K'] is False and board_state.has_moved['KR'] is False else ''
-        castling += 'Q' if board_state.has_moved['K'] is False and board_state.has_moved['QR'] is False else ''
-        castling += 'k' if board_state.has_moved['k'] is False and board_state.has_moved['kr'] is False else ''
-        castling += 'q' if board_state.has_moved['k'] is False and board_state.has_moved['qr'] is False else ''
-        fen += ' ' + castling if castling else ' -'
-        
-        # En passant target square
-        # Assuming you have a way to determine the en passant square, otherwise put '-'
-        fen += ' -'  # Replace this with your logic to determine the en passant square
-        
-        # Halfmove clock
-        # Assuming you have a way to keep track of this, otherwise put '0'
-        fen += ' 0'  # Replace this with your actual halfmove clock
-        
-        # Fullmove number
-        # Assuming the move_number is incremented after each move and starts at 1
-        fullmove_number = max(board_state.move_number[Piece.White], board_state.move_number[Piece.Black]) + 1
-        fen += f' {fullmove_number}'
-        
-        return fen
+        # Piece placement, the ranks are translated to letters in one go and the empty runs counted afterwards
+        letters = bytes(board_state.board).translate(_PLACEMENT_CHARS).decode('ascii')
+        placement = '/'.join([letters[0:8], letters[8:16], letters[16:24], letters[24:32],
+                              letters[32:40], letters[40:48], letters[48:56], letters[56:64]])
+        for run, count in _EMPTY_RUNS:
+            placement = placement.replace(run, count)
+
+        has_moved = board_state.has_moved
+        castling = ''.join(letter for letter, (king, rook) in CASTLING_KEYS.items() if not has_moved[king] and not has_moved[rook])
+        en_passant_square = board_state.en_passant_square
+        en_passant = '-' if en_passant_square is None else FILES[en_passant_square[1]] + str(8 - en_passant_square[0])
+        # Starts at 1 and goes up after every Black move, as White's move_number does
+        fullmove_number = board_state.move_number[Piece.White] + 1
+        return ' '.join([placement, 'w' if board_state.current_player_color == Piece.White else 'b', castling or '-',
+                         en_passant, str(board_state.halfmove_clock), str(fullmove_number)])
+
+
+def position_of(board_state):
+    """The position as it is sent to another process, its FEN (which keeps the en passant square)."""
+    return FEN().board_state_to_fen(board_state)
+
+
+def board_state_from_position(position):
+    """A new BoardState set up from a position made by position_of."""
+    from board_state import BoardState
+    board_state = BoardState()
+    FEN().fen_to_board_state(position, board_state)
+    return board_state
+
+
+def random_fens(count, seed=0, max_plies=80):
+    """count FEN records from random games (see corpus.random_playouts), a corpus for benchmark."""
+    from board_state import BoardState
+    from corpus import random_playouts
+    fen = FEN()
+    board_state = BoardState()
+    fens = []
+    for move in random_playouts(seed, max_plies, board_state):
+        if move is not None:
+            fens.append(fen.board_state_to_fen(board_state))
+            if len(fens) == count:
+                break
+    return fens
+
+
+def benchmark(fens):
+    """
+    Records per second for parsing fens without the cache, with the cache warm, loading them into a BoardState
+    (fen_to_board_state, which also rebuilds the derived state) and serializing them back. Checks every record
+    round trips.
+    """
+    from board_state import BoardState
+    fen = FEN()
+    parse = parse_fen.__wrapped__
+    start = time.perf_counter()
+    for text in fens:
+        parse(text)
+    parse_time = time.perf_counter() - start
+
+    # As many records as the cache holds, looked up again and again
+    hot = fens[:parse_fen.cache_info().maxsize]
+    parse_fen.cache_clear()
+    for text in hot:
+        parse_fen(text)
+    start = time.perf_counter()
+    for index in range(len(fens)):
+        parse_fen(hot[index % len(hot)])
+    cached_time = time.perf_counter() - start
+
+    board_states = []
+    start = time.perf_counter()
+    for text in fens:
+        board_state = BoardState()
+        fen.fen_to_board_state(text, board_state)
+        board_states.append(board_state)
+    load_time = time.perf_counter() - start
+    # BoardState() itself loads the start position, which is not what is being measured
+    start = time.perf_counter()
+    for _ in fens:
+        BoardState()
+    load_time -= time.perf_counter() - start
+
+    start = time.perf_counter()
+    written = [fen.board_state_to_fen(board_state) for board_state in board_states]
+    serialize_time = time.perf_counter() - start
+    if written != list(fens):
+        raise AssertionError("FEN records do not round trip")
+    count = len(fens)
+    return {
+        'records': count,
+        'parse_per_second': count / parse_time,
+        'cached_parse_per_second': count / cached_time,
+        'load_per_second': count / load_time,
+        'serialize_per_second': count / serialize_time,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time FEN parsing and serializing on positions from random games.")
+    parser.add_argument('--positions', type=int, default=20000)
+    parser.add_argument('--file', help="read the FEN records from this file instead, one per line")
+    args = parser.parse_args()
+    if args.file:
+        with open(args.file) as file:
+            corpus = [line.strip() for line in file if line.strip()]
+    else:
+        corpus = random_fens(args.positions)
+    result = benchmark(corpus)
+    print(f"{result['records']} records: parse {result['parse_per_second']:.0f}/s, cached {result['cached_parse_per_second']:.0f}/s, "
+          f"load into BoardState {result['load_per_second']:.0f}/s, serialize {result['serialize_per_second']:.0f}/s")
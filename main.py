@@ -13,6 +13,8 @@ def main():
     running = True
 
     chess = Chess(1024)
+    screen.fill((55, 58, 63))
+    pygame.display.flip()
     try:
         while running:
             for event in pygame.event.get():
@@ -31,21 +33,25 @@ def main():
                     if event.key == pygame.K_s:
                         chess.board_state.save()
                     if event.key == pygame.K_l:
-                        chess.board_state.load()
+                        chess.load()
                     if event.key == pygame.K_u:
                         chess.undo_last_move()
+                    if event.key == pygame.K_a:
+                        # The AI takes over the side to move and plays it from now on
+                        chess.ai_color = chess.board_state.current_player_color
+                        chess.do_next_ai_move()
 
                     if event.key == pygame.K_ESCAPE:
                         running = False                    
 
-            screen.fill((55, 58, 63))
             if (test_mode):
                 #run_tests(chess, screen)
                 run_tests()
+                pygame.display.flip()
             else:
                 chess.update()
-                chess.draw(screen)
-            pygame.display.flip()
+                # Only the squares that changed are sent to the display, an idle frame sends nothing
+                pygame.display.update(chess.draw(screen))
             clock.tick(60)  # limits FPS to 60
     except Exception as e:
         print ("Exception caught: ", e)
@@ -53,6 +59,7 @@ def main():
         chess.save_fen_state()
 
     finally:
+        chess.search.close()
         pygame.quit()
 
 if __name__ == "__main__":
@@ -1,8 +1,13 @@
 import random
-from chess_move import ChessMove
+from bitboard import iterate_squares, square_index, square_position
+from bitboard_move_generator import BitboardMoveGenerator
+from chess_move import PROMOTION_TYPES, ChessMove
 from piece import Piece
 class MoveGenerator:
     
+    # Used instead of the square scanning code below when the BoardState runs on the bitboard backend
+    bitboard_generator = BitboardMoveGenerator()
+
     rook_directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
     bishop_directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
     queen_directions = [(1, 1), (1, -1), (-1, 1), (-1, -1),(0, 1), (1, 0), (0, -1), (-1, 0)]
@@ -10,44 +15,67 @@ class MoveGenerator:
     king_directions = [(1, 1), (1, 0), (1, -1), (0, 1), (0, -1), (-1, 1), (-1, 0), (-1, -1)]
 
     def get_all_moves_for_color(self, board_state, color):
-        all_moves = []
-        for row in range(8):
-            for col in range(8):
-                moves = self.get_moves_for_piece((row, col), board_state)
-                if moves is not None:
-                    for move in moves:
-                        all_moves.append(move)
-        sorted_moves = sorted(all_moves, key=lambda move: Piece.get_piece_value(move.piece), reverse=True)
-        return sorted_moves
+        return self.get_all_moves(board_state, color)
 
 
-    def get_all_moves(self, board_state):
+    def get_all_moves(self, board_state, color=None):
+        if color is None:
+            color = board_state.current_player_color
+        if board_state.bitboards is not None:
+            return self.bitboard_generator.generate_legal_moves(board_state, color)
         all_moves = []
-        for row in range(8):
-            for col in range(8):
-                moves = self.get_moves_for_piece((row, col), board_state)
-                if moves is not None:
-                    for move in moves:
-                        all_moves.append(move)
-        sorted_moves = sorted(all_moves, key=lambda move: Piece.get_piece_value(move.piece), reverse=True)
-        return sorted_moves
+        # Snapshot, checking legality makes and undoes moves which reorders the piece list
+        for position in list(board_state.piece_positions[color]):
+            moves = self.get_moves_for_piece(position, board_state)
+            if moves is not None:
+                for move in moves:
+                    all_moves.append(move)
+        # Unordered, the search orders moves itself (see move_ordering.py)
+        return all_moves
+
+    def get_capture_moves(self, board_state, color=None):
+        """Legal captures and queen promotions only, quiet moves are not generated on the bitboard backend."""
+        if color is None:
+            color = board_state.current_player_color
+        if board_state.bitboards is not None:
+            return self.bitboard_generator.generate_legal_moves(board_state, color, captures_only=True)
+        return [move for move in self.get_all_moves(board_state, color) if move.promotion & 7 in (Piece.No_Piece, Piece.Queen)
+                and (move.captured_piece != Piece.No_Piece or (Piece.is_pawn(move.piece) and move.end[0] in (0, 7)))]
+
+    def get_packed_moves(self, board_state, color, buffer, captures_only=False, from_mask=None):
+        """
+        Legal moves as packed ints (see chess_move.encode_move) written into buffer, returns how many. The bitboard
+        backend writes them directly, the array backend packs the ChessMoves it generates.
+        from_mask, a bitboard of squares, limits the moves to the pieces standing on them.
+        """
+        if board_state.bitboards is not None:
+            if from_mask is None:
+                return self.bitboard_generator.generate_packed_moves(board_state, color, buffer, captures_only=captures_only)
+            return self.bitboard_generator.generate_packed_moves(board_state, color, buffer, from_mask, captures_only)
+        moves = self.get_capture_moves(board_state, color) if captures_only else self.get_all_moves(board_state, color)
+        if from_mask is not None:
+            moves = [move for move in moves if from_mask >> square_index(move.start[0], move.start[1]) & 1]
+        for index, move in enumerate(moves):
+            buffer[index] = move.pack()
+        return len(moves)
 
     def generate_legal_moves(self, board_state):
+        if board_state.bitboards is not None:
+            return self.bitboard_generator.generate_legal_moves(board_state, board_state.current_player_color)
         all_moves = []
-        for row in range(8):
-            for col in range(8):
-                piece = board_state.board[row][col]
-                if (piece == Piece.No_Piece or Piece.get_piece_color(piece) != board_state.current_player_color):
-                    continue
-                moves = self.get_moves_for_piece((row, col), board_state)
-                if moves is not None:
-                    all_moves.extend(moves)
+        for position in list(board_state.piece_positions[board_state.current_player_color]):
+            moves = self.get_moves_for_piece(position, board_state)
+            if moves is not None:
+                all_moves.extend(moves)
         return all_moves
 
     def get_moves_for_piece(self, start_position, board_state):
-        piece = board_state.board[start_position[0]][start_position[1]]
+        piece = board_state.board[start_position[0] * 8 + start_position[1]]
         if piece == Piece.No_Piece:
             return []
+        if board_state.bitboards is not None:
+            from_mask = 1 << square_index(start_position[0], start_position[1])
+            return self.bitboard_generator.generate_legal_moves(board_state, Piece.get_piece_color(piece), from_mask)
         potential_moves = []
         #board_state.prepare()
         # Generate all potential moves for the piece
@@ -76,14 +104,18 @@ class MoveGenerator:
                     # todo: find the cause of this!!!
                     pass
 
-                
-                valid_moves.append(ChessMove(piece,start_position, (move[0],move[1]),  board_state.board[move[0]][move[1]]))
+
+                if Piece.is_pawn(piece) and move[0] in (0, 7):
+                    for promotion in PROMOTION_TYPES:
+                        valid_moves.append(ChessMove(piece, start_position, (move[0], move[1]), board_state.board[move[0] * 8 + move[1]]).promote(promotion | Piece.get_piece_color(piece)))
+                else:
+                    valid_moves.append(ChessMove(piece,start_position, (move[0],move[1]),  board_state.board[move[0] * 8 + move[1]]))
             #else:
             #    print("Move ", move, " leaves king in check")
         return valid_moves
 
     def get_moves_for_piece_without_check_detection(self, start_position, board_state):
-        piece = board_state.board[start_position[0]][start_position[1]]
+        piece = board_state.board[start_position[0] * 8 + start_position[1]]
         if piece is None or piece == Piece.No_Piece or start_position is None or board_state is None:
             return None
         if Piece.is_bishop(piece):
@@ -102,15 +134,9 @@ class MoveGenerator:
     def does_move_leave_king_in_check(self, moved_piece, start_position, end_position, king_position, board_state):
         # Create a copy of the board to simulate the move
         board_state.update_board(start_position, end_position)
-        #board_state.prepare()
-        # If the moved piece is the king, update the king's position for the simulation
-        # if Piece.is_king(moved_piece):
-        #     #print ("moved piece is king")
-        #     king_position = end_position
-        # else:
-        #     #print ("Finding king position")
-        #     king_position = board_state.get_king_position(Piece.get_piece_color(moved_piece))
-            #print ("King position: ", king_position)
+        # A king move is checked on the square it goes to, not the one it left
+        if Piece.is_king(moved_piece):
+            king_position = (end_position[0], end_position[1])
         # Check if the king is in check after the move
         in_check = self.is_king_in_check(Piece.get_piece_color(moved_piece), king_position, board_state)
         board_state.undo_last_move()
@@ -131,7 +157,7 @@ class MoveGenerator:
                 if not (0 <= end_row < 8 and 0 <= end_col < 8):
                     break
 
-                end_piece = board_state.board[end_row][end_col]
+                end_piece = board_state.board[end_row * 8 + end_col]
                 if end_piece == Piece.No_Piece:
                     moves.append((end_row, end_col))
                 else:
@@ -159,9 +185,9 @@ class MoveGenerator:
 
         # Forward moves
         if forward_one is not None and forward_one >= 0 and forward_one < 8:
-            if board_state.board[forward_one][start_col] == Piece.No_Piece:
+            if board_state.board[forward_one * 8 + start_col] == Piece.No_Piece:
                 moves.append((forward_one, start_col))
-                if forward_two is not None and board_state.board[forward_two][start_col] == Piece.No_Piece:
+                if forward_two is not None and board_state.board[forward_two * 8 + start_col] == Piece.No_Piece:
                     moves.append((forward_two, start_col))
 
         # Diagonal Captures
@@ -169,33 +195,14 @@ class MoveGenerator:
             capture_row = forward_one
             capture_col = start_col + col_offset
             if 0 <= capture_row < 8 and 0 <= capture_col < 8:
-                capture_piece = board_state.board[capture_row][capture_col]
+                capture_piece = board_state.board[capture_row * 8 + capture_col]
                 if capture_piece != Piece.No_Piece and Piece.get_piece_color(capture_piece) != color:
                     moves.append((capture_row, capture_col))
 
-        #print(f"Checking en passant for pawn at {start_position}")
-        last_move_tuple = board_state.move_history[-1] if len(board_state.move_history) > 0 else None
-        if last_move_tuple:
-            last_move, _ = last_move_tuple
-            from_row, from_col = last_move.start
-            to_row, to_col = last_move.end
-            #print(f"Last move: from {from_row},{from_col} to {to_row},{to_col}")
-
-            if abs(from_row - to_row) == 2 and from_col == to_col:
-                #print("Last move was a two-square pawn move.")
-                if start_position[0] == to_row and abs(start_position[1] - to_col) == 1:
-                    #print("En passant condition met.")
-                    if Piece.get_piece_color(pawn) == Piece.White:
-                        en_passant_target_row = to_row - 1  # For white pawns, move one row down
-                    else:
-                        en_passant_target_row = to_row + 1  # For black pawns, move one row up
-
-                    en_passant_move = (en_passant_target_row, to_col)  # Target square for en passant
-                    moves.append(en_passant_move)                     
-                #else:
-                #    print("Pawn not adjacent for en passant.")
-            #else:
-            #    ("Last move not eligible for en passant.")
+        # En passant, the target square is only set right after an enemy pawn's double step
+        en_passant_square = board_state.get_en_passant_square()
+        if en_passant_square is not None and en_passant_square[0] == forward_one and abs(en_passant_square[1] - start_col) == 1:
+            moves.append(en_passant_square)
 
         return moves
     
@@ -216,28 +223,30 @@ class MoveGenerator:
         return moves    
     
     def get_attacked_squares(self, board_state, color):
+            if board_state.bitboards is not None:
+                attacked = self.bitboard_generator.get_attacked_squares(board_state.bitboards, color)
+                return {square_position(square) for square in iterate_squares(attacked)}
             attacked_squares = set()  # Use a set to avoid duplicate entries
-            for row in range(8):
-                for col in range(8):
-                    piece = board_state.board[row][col]
-                    if piece != Piece.No_Piece and Piece.get_piece_color(piece) == color:
-                        if Piece.is_pawn(piece):
-                            # Pass row and col as separate arguments, not as a tuple or piece
-                            attacked_squares.update(self.generate_pawn_capture_moves(row, col, color))
-                        elif Piece.is_knight(piece):
-                            attacked_squares.update(self.generate_moves(piece, (row, col), self.knight_directions, 1, board_state))
-                        elif Piece.is_bishop(piece):
-                            attacked_squares.update(self.generate_moves(piece, (row, col), self.bishop_directions, 8, board_state))
-                        elif Piece.is_rook(piece):
-                            attacked_squares.update(self.generate_moves(piece, (row, col), self.rook_directions, 8, board_state))
-                        elif Piece.is_queen(piece):
-                            attacked_squares.update(self.generate_moves(piece, (row, col), self.queen_directions, 8, board_state))
-                        elif Piece.is_king(piece):
-                            attacked_squares.update(self.generate_moves(piece, (row, col), self.king_directions, 1, board_state))
+            for (row, col), piece in board_state.piece_positions[color].items():
+                if Piece.is_pawn(piece):
+                    # Pass row and col as separate arguments, not as a tuple or piece
+                    attacked_squares.update(self.generate_pawn_capture_moves(row, col, color))
+                elif Piece.is_knight(piece):
+                    attacked_squares.update(self.generate_moves(piece, (row, col), self.knight_directions, 2, board_state))
+                elif Piece.is_bishop(piece):
+                    attacked_squares.update(self.generate_moves(piece, (row, col), self.bishop_directions, 8, board_state))
+                elif Piece.is_rook(piece):
+                    attacked_squares.update(self.generate_moves(piece, (row, col), self.rook_directions, 8, board_state))
+                elif Piece.is_queen(piece):
+                    attacked_squares.update(self.generate_moves(piece, (row, col), self.queen_directions, 8, board_state))
+                elif Piece.is_king(piece):
+                    attacked_squares.update(self.generate_moves(piece, (row, col), self.king_directions, 2, board_state))
             return attacked_squares
 
     def is_king_in_check(self, king_color, king_position, board_state):
         opponent_color = Piece.Black if king_color == Piece.White else Piece.White
+        if board_state.bitboards is not None:
+            return self.bitboard_generator.is_square_attacked(square_index(*king_position), opponent_color, board_state.bitboards)
         
         opponent_pieces_positions = board_state.get_all_pieces_positions_by_color(opponent_color)
         if (opponent_pieces_positions is None):
@@ -257,30 +266,18 @@ class MoveGenerator:
         return False
 
     def is_checkmate(self, king_color, board_state):
+        if board_state.bitboards is not None:
+            if not self.bitboard_generator.is_king_in_check(board_state.bitboards, king_color):
+                return False
+            return len(self.bitboard_generator.generate_legal_moves(board_state, king_color)) == 0
         king_position = board_state.get_king_position(king_color)
         if not self.is_king_in_check(king_color, king_position, board_state):
             return False  # King is not in check, so it cannot be checkmate
 
-        # Get all pieces for the king's color
-        pieces_positions = board_state.white_positions if king_color == Piece.White else board_state.black_positions
-        
-        # Try all possible moves for all pieces of the king's color
-        for row, col, piece in pieces_positions:
-            start_position = (row, col)
-            # Generate all possible moves for this piece
-            possible_moves = self.get_moves_for_piece(start_position, board_state)
-            if possible_moves is None:
-                continue
-            
-            for move in possible_moves:
-                # Simulate the move
-                board_state.update_board(move.start, move.end)
-                board_state.prepare()
-                # Check if the king is still in check after this move
-                if not self.is_king_in_check(king_color, board_state.get_king_position(king_color), board_state):
-                    board_state.undo_last_move()
-                    return False  # Found a move that takes the king out of check, so it's not checkmate
-                board_state.undo_last_move()
+        # Try all pieces of the king's color, get_moves_for_piece only returns moves that get the king out of check
+        for start_position in list(board_state.piece_positions[king_color]):
+            if self.get_moves_for_piece(start_position, board_state):
+                return False  # Found a move that takes the king out of check, so it's not checkmate
 
         return True  # No moves take the king out of check, so it's checkmate
     
@@ -292,25 +289,24 @@ class MoveGenerator:
 
         step = 1 if start_col < end_col else -1
         for col in range(start_col + step, end_col, step):
-            if board_state.board[start_row][col] != Piece.No_Piece:
+            if board_state.board[start_row * 8 + col] != Piece.No_Piece:
                 return False
         return True
 
     def is_square_under_attack(self, square, target_color, board_state):
         # Determine the color of the opponent
         opponent_color = Piece.White if target_color == Piece.Black else Piece.Black
+        if board_state.bitboards is not None:
+            return self.bitboard_generator.is_square_attacked(square_index(*square), opponent_color, board_state.bitboards)
 
-        # Iterate over all squares on the board to find opponent pieces
-        for row in range(8):
-            for col in range(8):
-                piece = board_state.board[row][col]
-                if piece != Piece.No_Piece and Piece.get_piece_color(piece) == opponent_color:
-                    # Generate moves for this opponent piece
-                    moves = self.get_moves_for_piece_without_check_detection((row, col), board_state)
+        # Go through the opponent's pieces
+        for position in list(board_state.piece_positions[opponent_color]):
+            # Generate moves for this opponent piece
+            moves = self.get_moves_for_piece_without_check_detection(position, board_state)
 
-                    # Check if any move targets the square in question
-                    if square in moves:
-                        return True
+            # Check if any move targets the square in question
+            if square in moves:
+                return True
 
         # If no opponent moves target the square, it is not under attack
         return False
@@ -350,7 +346,7 @@ class MoveGenerator:
             intermediate_position = (king_position[0], king_position[1] + offset * direction)
 
             # Check if the square is empty
-            if board_state.board[intermediate_position[0]][intermediate_position[1]] != Piece.No_Piece:
+            if board_state.board[intermediate_position[0] * 8 + intermediate_position[1]] != Piece.No_Piece:
                 return False
 
             # Check if the square the king moves through is under attack
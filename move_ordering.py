@@ -0,0 +1,113 @@
+from array import array
+from chess_move import CAPTURED_SHIFT, MOVE_KEY_MASK, PIECE_SHIFT
+from piece import Piece
+
+
+class MoveOrderer:
+    """
+    Orders moves for the alpha-beta search: the hash move, captures by most valuable victim / least valuable attacker,
+    queen promotions, the killer moves of the ply and finally the quiet moves (and underpromotions) by their history
+    counters.
+    Moves are packed ints, the scores are written to a flat list indexed like the move buffer and the moves are
+    sorted by index.
+    """
+
+    HASH_MOVE_SCORE = 1 << 30
+    CAPTURE_SCORE = 1 << 26
+    PROMOTION_SCORE = 1 << 25
+    KILLER_SCORE = 1 << 24
+    # History counters are halved before they could reach the killer scores
+    HISTORY_LIMIT = 1 << 23
+    MAX_PLY = 128
+
+    def __init__(self):
+        self.killers = [[0, 0] for _ in range(self.MAX_PLY)]
+        # Indexed by piece << 6 | to_square
+        self.history = array('i', bytes(4 * 16 * 64))
+        self.clear_stats()
+
+    def clear_stats(self):
+        self.nodes_per_ply = array('i', bytes(4 * self.MAX_PLY))
+        self.cutoffs_per_ply = array('i', bytes(4 * self.MAX_PLY))
+        self.first_move_cutoffs_per_ply = array('i', bytes(4 * self.MAX_PLY))
+
+    def new_search(self):
+        """Forgets the killers and ages the history so the previous search still counts, but less."""
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        history = self.history
+        for index in range(len(history)):
+            history[index] >>= 1
+        self.clear_stats()
+
+    def order_moves(self, buffer, count, ply, hash_move=0):
+        """
+        Returns the first count packed moves of buffer (see chess_move.encode_move) sorted best first, hash_move is
+        a move key (see transposition_table.pack_move).
+        """
+        killer_1, killer_2 = self.killers[ply] if ply < self.MAX_PLY else (0, 0)
+        history = self.history
+        scores = [0] * count
+        for index in range(count):
+            move = buffer[index]
+            key = move & MOVE_KEY_MASK
+            captured_piece = move >> CAPTURED_SHIFT
+            if key == hash_move:
+                score = self.HASH_MOVE_SCORE
+            elif captured_piece:
+                # Victim type first, attacker type breaks ties (pawn 1 ... king 6)
+                score = self.CAPTURE_SCORE + ((captured_piece & 7) << 3) - ((move >> PIECE_SHIFT) & 7)
+                if key >> 12 == Piece.Queen:
+                    score += self.PROMOTION_SCORE
+            elif key >> 12 == Piece.Queen:
+                score = self.PROMOTION_SCORE
+            elif key == killer_1:
+                score = self.KILLER_SCORE
+            elif key == killer_2:
+                score = self.KILLER_SCORE - 1
+            else:
+                score = history[((move >> PIECE_SHIFT) & 15) << 6 | key >> 6 & 63]
+            scores[index] = score
+        order = sorted(range(count), key=scores.__getitem__, reverse=True)
+        return [buffer[index] for index in order]
+
+    def record_node(self, ply):
+        if ply < self.MAX_PLY:
+            self.nodes_per_ply[ply] += 1
+
+    def record_cutoff(self, move, ply, depth, move_index):
+        """Called when the packed move caused a beta cutoff, quiet moves become killers and gain history."""
+        if ply < self.MAX_PLY:
+            self.cutoffs_per_ply[ply] += 1
+            if move_index == 0:
+                self.first_move_cutoffs_per_ply[ply] += 1
+        key = move & MOVE_KEY_MASK
+        if move >> CAPTURED_SHIFT or key >> 12:
+            return
+        if ply < self.MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != key:
+                killers[1] = killers[0]
+                killers[0] = key
+        index = ((move >> PIECE_SHIFT) & 15) << 6 | key >> 6 & 63
+        self.history[index] += depth * depth
+        if self.history[index] >= self.HISTORY_LIMIT:
+            history = self.history
+            for i in range(len(history)):
+                history[i] >>= 1
+
+    def cutoff_stats(self):
+        """Per ply: nodes with moves searched, beta cutoffs, and the share of cutoffs caused by the first move."""
+        stats = []
+        deepest = max((ply for ply in range(self.MAX_PLY) if self.nodes_per_ply[ply]), default=-1)
+        for ply in range(deepest + 1):
+            nodes = self.nodes_per_ply[ply]
+            cutoffs = self.cutoffs_per_ply[ply]
+            stats.append({
+                'ply': ply,
+                'nodes': nodes,
+                'cutoffs': cutoffs,
+                'cutoff_rate': cutoffs / nodes if nodes else 0.0,
+                'first_move_rate': self.first_move_cutoffs_per_ply[ply] / cutoffs if cutoffs else 0.0,
+            })
+        return stats
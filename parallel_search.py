@@ -0,0 +1,282 @@
+"""
+Root splitting search on several processes.
+
+The first root move is searched on its own to get a score, the remaining moves are then handed out to a
+ProcessPoolExecutor and only have to prove they beat the best score so far (a null window search, re-searched with
+an open window when they do). The best score found is shared with the workers through a shared value, so moves
+started later are tested against the tighter bound. Positions travel to the workers as FEN, every worker keeps its own ChessAI and transposition table between tasks.
+
+The result does not depend on which worker finishes first: the best exact score wins, ties go to the move that
+comes first in the root move order.
+
+Run this file to compare against the single process search:
+
+    python parallel_search.py --workers 8 --depth 5
+
+or, with --startup, to check how long a fresh worker process takes to get ready against STARTUP_BUDGET.
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from board_state import BoardState
+from chess_ai import ChessAI, SearchAborted
+from chess_move import ChessMove
+from fen import FEN, board_state_from_position, position_of
+from piece import Piece
+
+benchmark_positions = [
+    FEN.standard_game,
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    FEN.fen_position_3,
+    FEN.fen_position_6,
+]
+
+
+class WorkerAI(ChessAI):
+    """ChessAI running in a worker process, it also stops when the parent sets the shared stop flag."""
+
+    stop_flag = None
+
+    def check_time(self):
+        if self.stop_flag is not None and self.stop_flag.value:
+            raise SearchAborted()
+        super().check_time()
+
+
+# Seconds a fresh worker process may take to import the engine and set up its WorkerAI, see measure_startup
+STARTUP_BUDGET = 0.5
+# The engine runs without these, a worker that imports them starts slower for nothing
+HEADLESS_FORBIDDEN_MODULES = ('pygame', 'numpy')
+
+_worker_ai = None
+_shared_alpha = None
+
+
+def _init_worker(max_depth, hash_size_mb, shared_alpha, stop_flag):
+    global _worker_ai, _shared_alpha
+    _worker_ai = WorkerAI(max_depth, hash_size_mb)
+    _worker_ai.stop_flag = stop_flag
+    _shared_alpha = shared_alpha
+
+
+def measure_startup(hash_size_mb=16):
+    """
+    Starts a new interpreter that imports this module and sets up a worker like _init_worker does. Returns the
+    seconds that took, interpreter start included, and which of HEADLESS_FORBIDDEN_MODULES it loaded.
+    Workers started with the spawn method pay this before their first task, forked workers inherit the parent.
+    """
+    code = ("import sys; import parallel_search; "
+            f"parallel_search._init_worker(1, {hash_size_mb}, None, None); "
+            f"print(' '.join(name for name in {HEADLESS_FORBIDDEN_MODULES!r} if name in sys.modules))")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stdout.split()
+
+
+def move_key_of(move):
+    return move.start, move.end, move.promotion
+
+
+def search_root_move(position, move_key, depth, alpha, deadline):
+    """
+    Worker task, searches the root move move_key (see move_key_of) of position to depth plies.
+    Returns (score, exact, nodes): exact is False when the move could not beat alpha and score is only an upper
+    bound. Returns None when the search was stopped or ran out of time (deadline is a time.time() value, or None).
+    """
+    ai = _worker_ai
+    board_state = board_state_from_position(position)
+    color = board_state.current_player_color
+    move = next(move for move in ai.move_generator.get_all_moves(board_state, color) if move_key_of(move) == move_key)
+    if _shared_alpha is not None:
+        alpha = max(alpha, _shared_alpha.value)
+
+    ai.max_depth = depth - 1
+    ai.can_abort = True
+    ai.deadline = None if deadline is None else time.perf_counter() + (deadline - time.time())
+    board_state.execute_move(move, detect_game_over=False)
+    try:
+        if alpha <= -ChessAI.INFINITY:
+            score = -ai.choose_best_move(board_state, Piece.get_opposite_color(color))[0]
+            exact = True
+            nodes = ai.nodes
+        else:
+            # Ties count as beating alpha, so equal moves all get exact scores and the merge can break the tie
+            score = -ai.choose_best_move(board_state, Piece.get_opposite_color(color), -alpha, -alpha + 1)[0]
+            nodes = ai.nodes
+            exact = score >= alpha
+            if exact:
+                score = -ai.choose_best_move(board_state, Piece.get_opposite_color(color), -ChessAI.INFINITY, -alpha + 1)[0]
+                nodes += ai.nodes
+                exact = score >= alpha
+    except SearchAborted:
+        return None
+    finally:
+        ai.can_abort = False
+        ai.deadline = None
+    # The worker searched from the reply, mates are one ply further from the real root
+    if score >= ChessAI.MATE_BOUND:
+        score -= 1
+    elif score <= -ChessAI.MATE_BOUND:
+        score += 1
+    return score, exact, nodes
+
+
+class ParallelSearch:
+    """
+    Drop in for ChessAI.search that splits every iteration's root moves between worker processes.
+    """
+
+    def __init__(self, max_depth, workers=None, hash_size_mb=16, movetime=None):
+        self.max_depth = max_depth
+        self.workers = workers or os.cpu_count() or 1
+        self.hash_size_mb = hash_size_mb
+        # Root move generation, ordering and time allocation stay in this process
+        self.ai = ChessAI(max_depth, hash_size_mb=1, movetime=movetime)
+        self.iterations = []
+        self.nodes = 0
+        self.executor = None
+        context = multiprocessing.get_context()
+        self.shared_alpha = context.Value('i', -ChessAI.INFINITY, lock=False)
+        self.stop_flag = context.Value('b', 0, lock=False)
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                initargs=(self.max_depth, self.hash_size_mb, self.shared_alpha, self.stop_flag))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def stop(self):
+        self.stop_flag.value = 1
+
+    def search(self, board_state, color=None, movetime=None, clock=None, increment=0, moves_to_go=None, on_iteration=None, infinite=False):
+        """Same arguments and result as ChessAI.search."""
+        if color is None:
+            color = board_state.current_player_color
+        self.start()
+        budget = None if infinite else self.ai.allocate_time(movetime, clock, increment, moves_to_go)
+        start_time = time.perf_counter()
+        deadline = None if budget is None else time.time() + budget
+        position = position_of(board_state)
+        self.iterations = []
+        self.nodes = 0
+
+        buffer = self.ai.move_buffers[0]
+        count = self.ai.move_generator.get_packed_moves(board_state, color, buffer)
+        moves = [ChessMove.from_packed(move) for move in self.ai.move_orderer.order_moves(buffer, count, 0)]
+        if not moves:
+            in_check = self.ai.move_generator.is_king_in_check(color, board_state.get_king_position(color), board_state)
+            return (-ChessAI.MATE_SCORE if in_check else 0), None
+        result = None, None
+        try:
+            for depth in range(1, self.max_depth + 1):
+                scores = self.search_root(position, moves, depth, deadline if depth > 1 else None)
+                if scores is None:
+                    break
+                best_index = max(range(len(moves)), key=lambda index: (scores[index][1], scores[index][0], -index))
+                result = scores[best_index][0], moves[best_index]
+                elapsed = time.perf_counter() - start_time
+                info = {'depth': depth, 'score': result[0], 'nodes': self.nodes, 'total_nodes': self.nodes, 'time': elapsed,
+                        'pv': [moves[best_index]]}
+                self.iterations.append(info)
+                if on_iteration is not None:
+                    on_iteration(info)
+                if self.stop_flag.value or (budget is not None and elapsed >= budget * self.ai.soft_limit):
+                    break
+                # Next iteration starts with the best move, the others keep their order
+                moves.insert(0, moves.pop(best_index))
+        finally:
+            self.stop_flag.value = 0
+        return result
+
+    def search_root(self, position, moves, depth, deadline):
+        """Returns (score, exact) for every root move, or None when the iteration was cut short."""
+        scores = [None] * len(moves)
+        # Youngest brothers wait: the first move is searched alone for a bound
+        first = self.executor.submit(search_root_move, position, move_key_of(moves[0]), depth, -ChessAI.INFINITY, deadline)
+        outcome = first.result()
+        if outcome is None:
+            return None
+        best = outcome[0]
+        scores[0] = (best, True)
+        self.nodes += outcome[2]
+        self.shared_alpha.value = best
+
+        pending = {self.executor.submit(search_root_move, position, move_key_of(move), depth, best, deadline): index
+                   for index, move in enumerate(moves) if index > 0}
+        aborted = False
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                outcome = future.result()
+                if outcome is None:
+                    aborted = True
+                    continue
+                score, exact, nodes = outcome
+                self.nodes += nodes
+                scores[index] = (score, exact)
+                if exact and score > self.shared_alpha.value:
+                    self.shared_alpha.value = score
+        self.shared_alpha.value = -ChessAI.INFINITY
+        return None if aborted else scores
+
+
+def benchmark(positions, depth, workers):
+    """Times the single process search against ParallelSearch on positions, both searching depth plies."""
+    report = []
+    parallel = ParallelSearch(depth, workers)
+    parallel.start()
+    try:
+        for fen in positions:
+            board_state = BoardState()
+            FEN().fen_to_board_state(fen, board_state)
+            ai = ChessAI(depth)
+            start = time.perf_counter()
+            single_score, single_move = ai.search(board_state)
+            single_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            parallel_score, parallel_move = parallel.search(board_state)
+            parallel_time = time.perf_counter() - start
+            report.append({
+                'fen': fen,
+                'single_time': single_time,
+                'parallel_time': parallel_time,
+                'speedup': single_time / parallel_time,
+                'single': (single_score, single_move.start, single_move.end),
+                'cutoff_stats': ai.iterations[-1]['cutoff_stats'],
+                'parallel': (parallel_score, parallel_move.start, parallel_move.end),
+            })
+    finally:
+        parallel.close()
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the parallel root search with the single process search.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--startup', action='store_true', help="only measure how long a new worker process takes to start")
+    args = parser.parse_args()
+    if args.startup:
+        seconds, modules = measure_startup()
+        print(f"worker ready in {seconds * 1000:.0f}ms, budget {STARTUP_BUDGET * 1000:.0f}ms"
+              + (f", loaded {' '.join(modules)}" if modules else ""))
+        sys.exit(0 if seconds <= STARTUP_BUDGET and not modules else 1)
+    total_single = total_parallel = 0
+    for row in benchmark(benchmark_positions, args.depth, args.workers):
+        total_single += row['single_time']
+        total_parallel += row['parallel_time']
+        print(f"{row['single_time']:7.2f}s {row['parallel_time']:7.2f}s  x{row['speedup']:.2f}  {row['single']} {row['parallel']}  {row['fen']}")
+        # Move ordering of the single process search's last iteration: cutoff rate / share on the first move by ply
+        print("    cutoffs " + ' '.join(f"{ply['ply']}:{ply['cutoff_rate']:.0%}/{ply['first_move_rate']:.0%}" for ply in row['cutoff_stats']))
+    print(f"{args.workers} workers, depth {args.depth}: {total_single:.2f}s -> {total_parallel:.2f}s, speedup x{total_single / total_parallel:.2f}")
@@ -0,0 +1,222 @@
+"""
+Perft: counts the leaf nodes of the legal move tree to a fixed depth, the standard check for a move generator.
+
+    python perft.py --depth 4                      start position
+    python perft.py --fen "<fen>" --depth 3 --divide
+    python perft.py --suite --depth 3 --json perft.json
+    python perft.py --fen "<fen>" --depth 5 --workers 8 --hash 64
+
+The last ply is bulk counted: the moves are generated but not made. --divide prints the count below every root move
+(in UCI notation, for comparing with another engine), --suite runs the positions from FEN against their known counts
+and exits with status 1 on a mismatch. --json writes one record per position and depth for regression tracking.
+
+--workers hands the root moves out to a process pool and prints how long every worker was busy. --hash keeps the
+count of every subtree in a PerftTable (one per worker) keyed by position and depth, so transpositions are counted once.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from board_state import BoardState
+from chess_move import move_buffers, move_to_uci, uci_to_move
+from fen import FEN, board_state_from_position, position_of
+from move_generator import MoveGenerator
+
+# Known node counts from depth 1 up, https://www.chessprogramming.org/Perft_Results
+SUITE = [
+    ('startpos', FEN.standard_game, [20, 400, 8902, 197281, 4865609]),
+    ('position 2', FEN.fen_position_2, [48, 2039, 97862, 4085603]),
+    ('position 3', FEN.fen_position_3, [14, 191, 2812, 43238, 674624]),
+    ('position 4', FEN.fen_position_4, [6, 264, 9467, 422333]),
+    ('position 4 mirrored', FEN.fen_position_4_2, [6, 264, 9467, 422333]),
+    ('position 5', FEN.fen_position_5, [44, 1486, 62379, 2103487]),
+    ('position 6', FEN.fen_position_6, [46, 2079, 89890, 3894594]),
+]
+
+move_generator = MoveGenerator()
+
+
+class PerftTable:
+    """
+    Subtree node counts keyed by BoardState.zobrist_hash and depth, in parallel typed arrays like the
+    TranspositionTable. One entry per slot, always replaced.
+    """
+
+    ENTRY_BYTES = 8 + 8 + 1  # key, nodes, depth
+
+    def __init__(self, size_mb=16):
+        self.size = max(1, int(size_mb * 1024 * 1024) // self.ENTRY_BYTES)
+        self.keys = array('Q', bytes(8 * self.size))
+        self.nodes = array('Q', bytes(8 * self.size))
+        self.depths = array('B', bytes(self.size))
+        self.hits = 0
+
+    def probe(self, key, depth):
+        slot = key % self.size
+        if self.depths[slot] == depth and self.keys[slot] == key:
+            self.hits += 1
+            return self.nodes[slot]
+        return None
+
+    def store(self, key, depth, nodes):
+        slot = key % self.size
+        self.keys[slot] = key
+        self.nodes[slot] = nodes
+        self.depths[slot] = depth
+
+
+def perft(board_state, depth, table=None, buffers=None):
+    """
+    Leaf nodes below board_state at depth. The moves are packed ints generated into buffers, one preallocated list
+    per remaining depth (see chess_move.move_buffers).
+    """
+    if depth <= 0:
+        return 1
+    if buffers is None:
+        buffers = move_buffers(depth)
+    if table is not None and depth > 1:
+        key = board_state.zobrist_hash
+        nodes = table.probe(key, depth)
+        if nodes is not None:
+            return nodes
+    buffer = buffers[depth - 1]
+    count = move_generator.get_packed_moves(board_state, board_state.current_player_color, buffer)
+    if depth == 1:
+        return count
+    nodes = 0
+    for index in range(count):
+        board_state.execute_packed_move(buffer[index], detect_game_over=False)
+        nodes += perft(board_state, depth - 1, table, buffers)
+        board_state.undo_last_move()
+    if table is not None:
+        table.store(key, depth, nodes)
+    return nodes
+
+
+def divide(board_state, depth, table=None):
+    """Perft below each root move, keyed by the move in UCI notation."""
+    counts = {}
+    for move in move_generator.get_all_moves(board_state, board_state.current_player_color):
+        board_state.execute_move(move, detect_game_over=False)
+        counts[move_to_uci(move)] = perft(board_state, depth - 1, table)
+        board_state.undo_last_move()
+    return counts
+
+
+_worker_table = None
+
+
+def _init_worker(hash_size_mb):
+    global _worker_table
+    _worker_table = PerftTable(hash_size_mb) if hash_size_mb else None
+
+
+def perft_root_move(position, move_text, depth):
+    """Worker task, perft below one root move. Returns (move_text, nodes, worker pid, seconds spent)."""
+    start = time.perf_counter()
+    board_state = board_state_from_position(position)
+    board_state.execute_move(uci_to_move(board_state, move_text), detect_game_over=False)
+    nodes = perft(board_state, depth - 1, _worker_table)
+    return move_text, nodes, os.getpid(), time.perf_counter() - start
+
+
+def parallel_divide(executor, board_state, depth):
+    """
+    divide() with every root move searched as a task on executor. Returns the counts and, per worker process,
+    the moves it counted, their nodes and the time it spent on them.
+    """
+    position = position_of(board_state)
+    futures = [executor.submit(perft_root_move, position, move_to_uci(move), depth)
+               for move in move_generator.get_all_moves(board_state, board_state.current_player_color)]
+    counts = {}
+    workers = {}
+    for future in as_completed(futures):
+        move_text, nodes, pid, elapsed = future.result()
+        counts[move_text] = nodes
+        worker = workers.setdefault(pid, {'pid': pid, 'moves': 0, 'nodes': 0, 'time': 0.0})
+        worker['moves'] += 1
+        worker['nodes'] += nodes
+        worker['time'] += elapsed
+    return counts, list(workers.values())
+
+
+def run(name, fen, depth, expected=None, show_divide=False, executor=None, hash_size_mb=0):
+    """
+    Runs perft on fen to depth, prints a report line and returns it as a dict. The root moves go to executor when
+    one is given, otherwise a serial run uses a PerftTable of hash_size_mb (none for 0).
+    """
+    board_state = BoardState()
+    FEN().fen_to_board_state(fen, board_state)
+    workers = []
+    start = time.perf_counter()
+    if executor is not None and depth > 1:
+        counts, workers = parallel_divide(executor, board_state, depth)
+        nodes = sum(counts.values())
+    elif show_divide:
+        counts = divide(board_state, depth, PerftTable(hash_size_mb) if hash_size_mb else None)
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(board_state, depth, PerftTable(hash_size_mb) if hash_size_mb else None)
+    elapsed = time.perf_counter() - start
+    if show_divide:
+        for move, count in sorted(counts.items()):
+            print(f"{move}: {count}")
+    result = {
+        'name': name,
+        'fen': fen,
+        'depth': depth,
+        'nodes': nodes,
+        'expected': expected,
+        'ok': expected is None or nodes == expected,
+        'time': elapsed,
+        'nps': int(nodes / elapsed) if elapsed > 0 else 0,
+        'workers': workers,
+    }
+    status = '' if expected is None else ('ok' if result['ok'] else f'FAILED, expected {expected}')
+    print(f"{name:<20} depth {depth}  {nodes:>10} nodes  {elapsed:7.2f}s  {result['nps']:>8} nps  {status}")
+    for worker in sorted(workers, key=lambda worker: worker['pid']):
+        print(f"    worker {worker['pid']:>7}: {worker['moves']:>3} moves  {worker['nodes']:>10} nodes  {worker['time']:7.2f}s busy")
+    return result
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Count the legal move tree to a fixed depth.")
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--fen', default=FEN.standard_game)
+    parser.add_argument('--divide', action='store_true', help="print the node count below every root move")
+    parser.add_argument('--suite', action='store_true', help="run the standard positions up to --depth against their known counts")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--workers', type=int, default=1, help="processes to split the root moves between")
+    parser.add_argument('--hash', type=int, default=0, help="megabytes of subtree count cache (per worker), 0 for none")
+    args = parser.parse_args(arguments)
+
+    executor = None
+    if args.workers > 1:
+        executor = ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.hash,))
+    results = []
+    try:
+        if args.suite:
+            for name, fen, counts in SUITE:
+                for depth in range(1, min(args.depth, len(counts)) + 1):
+                    results.append(run(name, fen, depth, counts[depth - 1], args.divide and depth == args.depth, executor, args.hash))
+        else:
+            expected = next((counts[args.depth - 1] for _, fen, counts in SUITE if fen == args.fen and args.depth <= len(counts)), None)
+            results.append(run('perft', args.fen, args.depth, expected, args.divide, executor, args.hash))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    nodes = sum(result['nodes'] for result in results)
+    elapsed = sum(result['time'] for result in results)
+    print(f"total {nodes} nodes in {elapsed:.2f}s, {int(nodes / elapsed) if elapsed > 0 else 0} nps")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'results': results, 'nodes': nodes, 'time': elapsed}, file, indent=2)
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
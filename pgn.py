@@ -0,0 +1,344 @@
+"""
+Streaming PGN reader: replays the games of a PGN database through the engine, one game in memory at a time.
+
+    python pgn.py games.pgn                     replay every game, report games and moves per second
+    python pgn.py games.pgn --limit 1000 --fens print the FEN after every move of the first 1000 games
+    python pgn.py --games 2000                  the same on random games, when there is no database at hand
+
+read_games splits a stream of lines into (tags, movetext) one game at a time, san_moves picks the moves out of
+the movetext (comments, variations, NAGs and move numbers are skipped) and parse_san finds each one among the
+legal moves. replay_games plays every game on a single BoardState with make/unmake and yields the moves as they
+are made, packed (see chess_move.encode_move), so positions are looked at on the board while the game is replayed.
+"""
+import argparse
+import io
+import re
+import sys
+import time
+from chess_move import CAPTURED_SHIFT, FLAG_CASTLING, MAX_MOVES, PIECE_SHIFT
+from fen import FEN, FILES
+from move_generator import MoveGenerator
+from piece import Piece
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+PIECE_LETTERS = {'N': Piece.Knight, 'B': Piece.Bishop, 'R': Piece.Rook, 'Q': Piece.Queen, 'K': Piece.King}
+LETTER_OF_TYPE = {piece_type: letter for letter, piece_type in PIECE_LETTERS.items()}
+
+_TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# Comments, variation brackets, NAGs, move numbers and everything else (moves and results)
+_TOKEN = re.compile(r'\{[^}]*\}|;[^\n]*|[()]|\$\d+|\d+\.+|[^\s(){};$]+')
+_SAN = re.compile(r'([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQnbrq]))?')
+
+move_generator = MoveGenerator()
+
+
+class PGNError(ValueError):
+    """A move that is not SAN, or not legal in its position."""
+
+
+def read_games(lines):
+    """
+    Yields (tags, movetext) for every game in lines (an open file or any iterable of lines), tags being a dict of
+    the tag pairs. Only the game being read is kept in memory. A game ends where the tags of the next one start.
+    """
+    tags = {}
+    movetext = []
+    in_comment = False
+    for line in lines:
+        line = line.strip()
+        if in_comment:
+            movetext.append(line)
+            in_comment = _comment_open_after(line, True)
+            continue
+        if not line or line[0] == '%':
+            continue
+        if line[0] == '[':
+            if movetext:
+                yield tags, '\n'.join(movetext)
+                tags = {}
+                movetext = []
+            match = _TAG.match(line)
+            if match:
+                tags[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+            continue
+        movetext.append(line)
+        in_comment = _comment_open_after(line, False)
+    if movetext or tags:
+        yield tags, '\n'.join(movetext)
+
+
+def _comment_open_after(line, in_comment):
+    """
+    Whether a brace comment is still open at the end of line, in_comment telling whether one was open at its start.
+    Brace comments do not nest, so { opens and } closes one, and outside of them a ; comments out the rest of the
+    line, braces included. Jumps from one brace or semicolon to the next with str.find instead of looping over
+    every character.
+    """
+    position = 0
+    while True:
+        if in_comment:
+            position = line.find('}', position)
+            if position < 0:
+                return True
+            in_comment = False
+        else:
+            brace = line.find('{', position)
+            semicolon = line.find(';', position)
+            if brace < 0 or 0 <= semicolon < brace:
+                return False
+            in_comment = True
+            position = brace
+        position += 1
+
+
+def san_moves(movetext):
+    """The moves of the main line of movetext in SAN, in order."""
+    depth = 0
+    for match in _TOKEN.finditer(movetext):
+        token = match.group()
+        first = token[0]
+        if first == '(':
+            depth += 1
+        elif first == ')':
+            depth -= 1
+        elif depth or first in '{;$' or token in RESULTS or (first.isdigit() and token[-1] == '.'):
+            continue
+        else:
+            yield token
+
+
+def _piece_mask(board_state, piece):
+    """Bitboard of the squares holding piece, None (every square) on the array backend."""
+    return None if board_state.bitboards is None else board_state.bitboards.pieces[piece]
+
+
+def parse_san(board_state, san, buffer=None):
+    """The legal move san stands for on board_state, packed. Raises PGNError when there is none or more than one."""
+    if buffer is None:
+        buffer = [0] * MAX_MOVES
+    color = board_state.current_player_color
+    text = san.rstrip('+#!?')
+    if text.endswith('e.p.'):
+        text = text[:-4]
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        count = move_generator.get_packed_moves(board_state, color, buffer, from_mask=_piece_mask(board_state, Piece.King | color))
+        kingside = len(text) == 3
+        for index in range(count):
+            code = buffer[index]
+            if code & FLAG_CASTLING and (((code >> 6) & 63) > (code & 63)) == kingside:
+                return code
+        raise PGNError(f"Illegal move {san}")
+
+    match = _SAN.fullmatch(text)
+    if match is None:
+        raise PGNError(f"Not a SAN move: {san}")
+    letter, from_file, from_rank, target, promotion = match.groups()
+    piece_type = PIECE_LETTERS[letter] if letter else Piece.Pawn
+    # Only the pieces the move names are generated for, most of the work of parsing a move is generating them
+    count = move_generator.get_packed_moves(board_state, color, buffer, from_mask=_piece_mask(board_state, piece_type | color))
+    to_square = (8 - int(target[1])) * 8 + FILES.index(target[0])
+    if promotion:
+        promotion_type = PIECE_LETTERS[promotion.upper()]
+    elif piece_type == Piece.Pawn and (to_square < 8 or to_square >= 56):
+        promotion_type = Piece.Queen  # Written without the piece now and then, a queen is meant
+    else:
+        promotion_type = 0
+    found = None
+    for index in range(count):
+        code = buffer[index]
+        if ((code >> 6) & 63 != to_square or (code >> PIECE_SHIFT) & 7 != piece_type or (code >> 12) & 7 != promotion_type
+                or (from_file and code & 7 != FILES.index(from_file)) or (from_rank and (code >> 3) & 7 != 8 - int(from_rank))):
+            continue
+        if found is not None:
+            raise PGNError(f"Ambiguous move {san}")
+        found = code
+    if found is None:
+        raise PGNError(f"Illegal move {san}")
+    return found
+
+
+def move_to_san(board_state, move, buffer=None):
+    """The SAN of the packed move, which must be legal on board_state, with + or # when it gives check or mate."""
+    if buffer is None:
+        buffer = [0] * MAX_MOVES
+    color = board_state.current_player_color
+    from_square = move & 63
+    to_square = (move >> 6) & 63
+    piece_type = (move >> PIECE_SHIFT) & 7
+    if move & FLAG_CASTLING:
+        san = 'O-O' if to_square > from_square else 'O-O-O'
+    else:
+        target = FILES[to_square & 7] + str(8 - (to_square >> 3))
+        capture = 'x' if move >> CAPTURED_SHIFT else ''
+        if piece_type == Piece.Pawn:
+            san = (FILES[from_square & 7] if capture else '') + capture + target
+            if (move >> 12) & 7:
+                san += '=' + LETTER_OF_TYPE[(move >> 12) & 7]
+        else:
+            count = move_generator.get_packed_moves(board_state, color, buffer)
+            rivals = [buffer[index] & 63 for index in range(count) if buffer[index] != move
+                      and (buffer[index] >> 6) & 63 == to_square and (buffer[index] >> PIECE_SHIFT) & 7 == piece_type]
+            if not rivals:
+                origin = ''
+            elif all(square & 7 != from_square & 7 for square in rivals):
+                origin = FILES[from_square & 7]
+            elif all(square >> 3 != from_square >> 3 for square in rivals):
+                origin = str(8 - (from_square >> 3))
+            else:
+                origin = FILES[from_square & 7] + str(8 - (from_square >> 3))
+            san = LETTER_OF_TYPE[piece_type] + origin + capture + target
+
+    board_state.execute_packed_move(move, detect_game_over=False)
+    opponent = board_state.current_player_color
+    if move_generator.is_king_in_check(opponent, board_state.get_king_position(opponent), board_state):
+        san += '#' if not move_generator.get_packed_moves(board_state, opponent, buffer) else '+'
+    board_state.undo_last_move()
+    return san
+
+
+def replay(board_state, movetext, buffer=None):
+    """
+    Plays the main line of movetext on board_state, which must hold the game's starting position, yielding each
+    packed move once it has been made. The moves are taken back when the generator finishes, fails or is closed,
+    so board_state ends where it started. Raises PGNError at the first move that is not legal.
+    """
+    if buffer is None:
+        buffer = [0] * MAX_MOVES
+    made = 0
+    try:
+        for san in san_moves(movetext):
+            move = parse_san(board_state, san, buffer)
+            board_state.execute_packed_move(move, detect_game_over=False)
+            made += 1
+            yield move
+    finally:
+        for _ in range(made):
+            board_state.undo_last_move()
+
+
+def replay_games(lines, board_state=None, errors=None):
+    """
+    Streams the games in lines (see read_games) and replays them one after another on board_state, a new BoardState
+    when none is given. Yields (game number, tags, ply, move) with the move packed and already made: board_state
+    holds the position after it while the item is being looked at. The starting position (the FEN tag, or the
+    standard one) is only loaded when it differs from the previous game's, every game is unmade to it at the end.
+    A game with an illegal move is dropped after the moves before it were yielded. Its (game number, tags, error)
+    goes to the errors list, or the PGNError is raised when errors is None.
+    """
+    if board_state is None:
+        from board_state import BoardState
+        board_state = BoardState()
+    fen = FEN()
+    buffer = [0] * MAX_MOVES
+    loaded = None
+    for number, (tags, movetext) in enumerate(read_games(lines), 1):
+        start = tags.get('FEN', FEN.standard_game)
+        if start != loaded:
+            # Forgets the previous start first, a bad FEN tag must not leave the board half loaded for the next game
+            loaded = None
+            try:
+                fen.fen_to_board_state(start, board_state)
+            except ValueError as error:
+                if errors is None:
+                    raise PGNError(f"Game {number}: bad FEN tag {start!r}") from error
+                errors.append((number, tags, error))
+                continue
+            loaded = start
+        moves = replay(board_state, movetext, buffer)
+        try:
+            for ply, move in enumerate(moves, 1):
+                yield number, tags, ply, move
+        except PGNError as error:
+            if errors is None:
+                raise PGNError(f"Game {number}: {error}") from error
+            errors.append((number, tags, error))
+        finally:
+            moves.close()
+
+
+def write_game(tags, sans, result='*'):
+    """PGN text of one game from its tags and its moves in SAN."""
+    lines = [f'[{name} "{value}"]' for name, value in tags.items()]
+    words = []
+    for ply, san in enumerate(sans):
+        if ply % 2 == 0:
+            words.append(f"{ply // 2 + 1}.")
+        words.append(san)
+    words.append(result)
+    return '\n'.join(lines) + '\n\n' + ' '.join(words) + '\n\n'
+
+
+def random_games(count, seed=0, max_plies=120):
+    """PGN text of count random games (see corpus.random_playouts), a corpus for benchmark without a database."""
+    from board_state import BoardState
+    from corpus import random_playouts
+    board_state = BoardState()
+    buffer = [0] * MAX_MOVES
+    text = []
+    sans = []
+    for move in random_playouts(seed, max_plies, board_state):
+        if move is not None:
+            # SAN is written from the position before the move
+            board_state.undo_last_move()
+            sans.append(move_to_san(board_state, move, buffer))
+            board_state.execute_packed_move(move, detect_game_over=False)
+            continue
+        color = board_state.current_player_color
+        result = '*'
+        if not move_generator.get_packed_moves(board_state, color, buffer):
+            in_check = move_generator.is_king_in_check(color, board_state.get_king_position(color), board_state)
+            result = ('0-1' if color == Piece.White else '1-0') if in_check else '1/2-1/2'
+        text.append(write_game({'Event': 'Random game', 'Round': str(len(text) + 1)}, sans, result))
+        sans = []
+        if len(text) == count:
+            break
+    return ''.join(text)
+
+
+def benchmark(lines, limit=None, show_fens=False):
+    """Replays the games in lines, returns the games, moves and errors counted and the time it took."""
+    from board_state import BoardState
+    board_state = BoardState()
+    fen = FEN()
+    errors = []
+    games = moves = 0
+    start = time.perf_counter()
+    for number, _, _, _ in replay_games(lines, board_state, errors):
+        if limit is not None and number > limit:
+            break
+        games = number
+        moves += 1
+        if show_fens:
+            print(fen.board_state_to_fen(board_state))
+    elapsed = time.perf_counter() - start
+    return {
+        'games': games,
+        'moves': moves,
+        'errors': len(errors),
+        'time': elapsed,
+        'games_per_second': games / elapsed if elapsed > 0 else 0.0,
+        'moves_per_second': moves / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Replay the games of a PGN file through the move generator.")
+    parser.add_argument('file', nargs='?', help="PGN file, random games are generated when left out")
+    parser.add_argument('--games', type=int, default=500, help="random games to generate when there is no file")
+    parser.add_argument('--limit', type=int, help="stop after this many games")
+    parser.add_argument('--fens', action='store_true', help="print the FEN after every move")
+    args = parser.parse_args(arguments)
+
+    if args.file:
+        # PGN databases are not always valid UTF-8, an odd character in a comment should not stop the run
+        with open(args.file, encoding='utf-8', errors='replace') as file:
+            result = benchmark(file, args.limit, args.fens)
+    else:
+        result = benchmark(io.StringIO(random_games(args.games)), args.limit, args.fens)
+    print(f"{result['games']} games, {result['moves']} moves, {result['errors']} with errors in {result['time']:.2f}s: "
+          f"{result['games_per_second']:.0f} games/s, {result['moves_per_second']:.0f} moves/s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -115,4 +115,4 @@ class Piece(IntEnum):
         return color + " " + pieceType        
 
     def __str__(self):
-        return self.description()
+        return Piece.description(self)
@@ -2,33 +2,54 @@ import pygame
 from piece import Piece
 
 class PieceDrawer:
-    
+
+    # Column of each piece type in the sprite sheet
+    piece_mapping = {
+        Piece.Pawn: 5,
+        Piece.Knight: 3,
+        Piece.Bishop: 2,
+        Piece.Rook: 4,
+        Piece.Queen: 1,
+        Piece.King: 0
+    }
+
     def __init__(self, image_path):
+        # Scaled sprites keyed by (piece, size), so drawing a piece is a single blit
+        self.sprites = {}
+        self.set_theme(image_path)
+
+    def set_theme(self, image_path):
+        """Loads another sprite sheet, the sprites scaled from the old one are dropped."""
         self.sprite_sheet = pygame.image.load(image_path).convert_alpha()
 
         # Assuming each piece type has equal width and each color has its own row
         self.piece_width = self.sprite_sheet.get_width() // 6
         self.piece_height = self.sprite_sheet.get_height() // 2
+        self.sprites.clear()
+
+    def prepare(self, size):
+        """Scales every piece to size up front, call at startup and when the squares change size."""
+        for color in (Piece.White, Piece.Black):
+            for piece_type in self.piece_mapping:
+                self.get_sprite(piece_type | color, size)
 
     def get_piece_image(self, piece_value):
         color_offset = 0 if piece_value < Piece.Black else 1
-
-        piece_mapping = {
-            Piece.Pawn: 5,
-            Piece.Knight: 3,
-            Piece.Bishop: 2,
-            Piece.Rook: 4,
-            Piece.Queen: 1,
-            Piece.King: 0
-        }
-        piece_type = piece_value % Piece.Black
-        column = piece_mapping.get(piece_type, 0)  # Default to 0 (King) if not found
+        column = self.piece_mapping.get(piece_value & 7, 0)  # Default to 0 (King) if not found
         rect = pygame.Rect(column * self.piece_width, color_offset * self.piece_height, self.piece_width, self.piece_height)
         piece_image = pygame.Surface((self.piece_width, self.piece_height), pygame.SRCALPHA)
         piece_image.blit(self.sprite_sheet, (0, 0), rect)
 
         return piece_image
 
+    def get_sprite(self, piece_value, size):
+        """The piece scaled to size, made on first use and cached."""
+        key = (piece_value, size)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = pygame.transform.smoothscale(self.get_piece_image(piece_value), size)
+            self.sprites[key] = sprite
+        return sprite
 
     def draw_piece(self, surface, piece_value, position, size):
         """
@@ -36,6 +57,4 @@ class PieceDrawer:
         `piece_value` should be one of the combined piece and color values from the Piece class.
         Position is a tuple (x, y), and size is the desired size to scale the piece to.
         """
-        piece_image = self.get_piece_image(piece_value)
-        piece_image = pygame.transform.smoothscale(piece_image, size)  # Use smoothscale here
-        surface.blit(piece_image, position)
+        surface.blit(self.get_sprite(piece_value, size), position)
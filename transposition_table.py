@@ -0,0 +1,91 @@
+from array import array
+
+
+class TranspositionTable:
+    """
+    Fixed size hash table of search results keyed by BoardState.zobrist_hash.
+
+    Entries live in parallel typed arrays (16 bytes per entry, no Python object per entry) and are grouped
+    in buckets of two: the first slot keeps the deepest result seen for the bucket, the second is always
+    replaced. Moves are stored packed as from_square | to_square << 6 | promotion type << 12 (see pack_move).
+    """
+
+    EMPTY = 0
+    EXACT = 1
+    LOWER_BOUND = 2
+    UPPER_BOUND = 3
+
+    ENTRY_BYTES = 8 + 4 + 2 + 1 + 1  # key, score, move, depth, bound
+    BUCKET_SIZE = 2
+    # Scores are finite: centipawns, or mates near ChessAI.MATE_SCORE (beyond MATE_BOUND) stored counted from the
+    # node (see ChessAI.score_to_table). The limit only keeps a stray value inside the 32 bit score array
+    SCORE_LIMIT = 2 ** 31 - 1
+
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        self.bucket_count = max(1, int(size_mb * 1024 * 1024) // (self.ENTRY_BYTES * self.BUCKET_SIZE))
+        self.clear()
+
+    def clear(self):
+        entries = self.bucket_count * self.BUCKET_SIZE
+        self.keys = array('Q', bytes(8 * entries))
+        self.scores = array('i', bytes(4 * entries))
+        self.moves = array('H', bytes(2 * entries))
+        self.depths = array('b', bytes(entries))
+        self.bounds = array('B', bytes(entries))
+        self.used = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0
+
+    def probe(self, key):
+        """
+        Returns (depth, score, bound, packed_move) stored for key, or None.
+        """
+        self.probes += 1
+        index = (key % self.bucket_count) * self.BUCKET_SIZE
+        for slot in (index, index + 1):
+            if self.keys[slot] == key and self.bounds[slot] != self.EMPTY:
+                self.hits += 1
+                return self.depths[slot], self.scores[slot], self.bounds[slot], self.moves[slot]
+        return None
+
+    def store(self, key, depth, score, bound, packed_move=0):
+        self.stores += 1
+        index = (key % self.bucket_count) * self.BUCKET_SIZE
+        # Depth preferred slot unless it holds a deeper result for another position, then the always replace slot
+        slot = index
+        if self.bounds[index] != self.EMPTY and self.keys[index] != key and self.depths[index] > depth:
+            slot = index + 1
+        elif self.keys[index + 1] == key and self.bounds[index + 1] != self.EMPTY:
+            # Drop the older copy of this position from the other slot
+            self.bounds[index + 1] = self.EMPTY
+            self.used -= 1
+
+        if self.bounds[slot] == self.EMPTY:
+            self.used += 1
+        elif self.keys[slot] != key:
+            self.collisions += 1
+        self.keys[slot] = key
+        self.scores[slot] = int(max(-self.SCORE_LIMIT, min(self.SCORE_LIMIT, score)))
+        self.moves[slot] = packed_move
+        self.depths[slot] = min(depth, 127)
+        self.bounds[slot] = bound
+
+    def stats(self):
+        entries = self.bucket_count * self.BUCKET_SIZE
+        return {
+            'size_mb': self.size_mb,
+            'entries': entries,
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.probes if self.probes else 0.0,
+            'stores': self.stores,
+            'fill_rate': self.used / entries,
+            'collisions': self.collisions,
+        }
+
+
+def pack_move(move):
+    return (move.start[0] * 8 + move.start[1]) | (move.end[0] * 8 + move.end[1]) << 6 | (move.promotion & 7) << 12
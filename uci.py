@@ -0,0 +1,234 @@
+"""
+UCI front end, lets chess GUIs and tournament managers (cutechess-cli, Arena, ...) drive the engine:
+
+    python uci.py
+
+Commands are read from stdin through an asyncio stream while the search runs on a worker thread, so isready and stop are
+answered in the middle of a search. Supported: uci, isready, ucinewgame, setoption (Hash, Threads),
+position startpos/fen with moves, go (depth, movetime, wtime, btime, winc, binc, movestogo, infinite), stop and quit.
+With Threads above 1 the search is a ParallelSearch on that many worker processes.
+"""
+import asyncio
+import os
+import sys
+import threading
+from chess_ai import ChessAI
+from chess_move import move_to_uci, uci_to_move
+from fen import FEN, board_state_from_position
+from move_generator import MoveGenerator
+from move_ordering import MoveOrderer
+from parallel_search import ParallelSearch
+from piece import Piece
+
+ENGINE_NAME = "Python Chess"
+ENGINE_AUTHOR = "Python Chess developers"
+
+
+def score_to_uci(score):
+    if score >= ChessAI.MATE_BOUND:
+        return f"mate {(ChessAI.MATE_SCORE - score + 1) // 2}"
+    if score <= -ChessAI.MATE_BOUND:
+        return f"mate -{(ChessAI.MATE_SCORE + score) // 2}"
+    return f"cp {score}"
+
+
+def info_line(info):
+    milliseconds = int(info['time'] * 1000)
+    # Both cover the whole search, nps of one iteration's nodes over the total time would come out too low
+    nodes = info['total_nodes']
+    nps = int(nodes / info['time']) if info['time'] > 0 else 0
+    pv = ' '.join(move_to_uci(move) for move in info['pv'])
+    return f"info depth {info['depth']} score {score_to_uci(info['score'])} nodes {nodes} nps {nps} time {milliseconds} pv {pv}"
+
+
+class UCIEngine:
+    """
+    Protocol state: the current position, the options and the running search. handle() takes one command line,
+    every reply goes through write so the engine can be tested without a terminal.
+    """
+
+    max_depth = 64
+    # Milliseconds per move in a timed game that gives the side to move no clock of its own
+    default_movetime = 1000
+
+    def __init__(self, write=None):
+        self.write = write or self.write_stdout
+        self.hash_size_mb = 16
+        self.threads = 1
+        self.searcher = None
+        self.board_state = board_state_from_position(FEN.standard_game)
+        self.search_task = None
+        self.stop_event = None
+
+    @staticmethod
+    def write_stdout(line):
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+    def get_searcher(self):
+        if self.searcher is None:
+            if self.threads > 1:
+                self.searcher = ParallelSearch(self.max_depth, self.threads, self.hash_size_mb)
+            else:
+                self.searcher = ChessAI(self.max_depth, self.hash_size_mb)
+        return self.searcher
+
+    def close_searcher(self):
+        if isinstance(self.searcher, ParallelSearch):
+            self.searcher.close()
+        self.searcher = None
+
+    async def run(self):
+        """Reads commands from stdin until quit or end of input."""
+        reader = asyncio.StreamReader()
+        loop = asyncio.get_running_loop()
+        threading.Thread(target=self.read_stdin, args=(loop, reader), daemon=True).start()
+        while True:
+            line = (await reader.readline()).decode()
+            if not line or not await self.handle(line):
+                break
+        await self.stop()
+        self.close_searcher()
+
+    @staticmethod
+    def read_stdin(loop, reader):
+        """
+        Feeds stdin to reader. Reads the file descriptor directly, unlike sys.stdin this holds no lock while it
+        waits, a lock that forked search processes would try to take when they close their stdin.
+        """
+        while True:
+            data = os.read(sys.stdin.fileno(), 4096)
+            if not data:
+                loop.call_soon_threadsafe(reader.feed_eof)
+                return
+            loop.call_soon_threadsafe(reader.feed_data, data)
+
+    async def handle(self, line):
+        """Executes one command, returns False on quit."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.write(f"id name {ENGINE_NAME}")
+            self.write(f"id author {ENGINE_AUTHOR}")
+            self.write("option name Hash type spin default 16 min 1 max 1024")
+            self.write(f"option name Threads type spin default 1 min 1 max {os.cpu_count() or 1}")
+            self.write("uciok")
+        elif command == 'isready':
+            self.write("readyok")
+        elif command == 'ucinewgame':
+            await self.stop()
+            self.close_searcher()
+        elif command == 'setoption':
+            await self.stop()
+            self.set_option(arguments)
+        elif command == 'position':
+            await self.stop()
+            self.set_position(arguments)
+        elif command == 'go':
+            await self.stop()
+            self.go(arguments)
+        elif command == 'stop':
+            await self.stop()
+        elif command == 'quit':
+            return False
+        return True
+
+    def set_option(self, arguments):
+        if 'name' not in arguments or 'value' not in arguments:
+            return
+        name = ' '.join(arguments[arguments.index('name') + 1:arguments.index('value')]).lower()
+        value = arguments[arguments.index('value') + 1]
+        if name == 'hash':
+            self.hash_size_mb = max(1, int(value))
+        elif name == 'threads':
+            self.threads = max(1, int(value))
+        else:
+            return
+        # Takes effect with the next search
+        self.close_searcher()
+
+    def set_position(self, arguments):
+        moves = arguments.index('moves') if 'moves' in arguments else len(arguments)
+        if arguments and arguments[0] == 'fen':
+            position = ' '.join(arguments[1:moves])
+        else:
+            position = FEN.standard_game
+        self.board_state = board_state_from_position(position)
+        for text in arguments[moves + 1:]:
+            move = uci_to_move(self.board_state, text)
+            if move is None:
+                self.write(f"info string illegal move {text}")
+                return
+            self.board_state.make_move(move)
+
+    def go(self, arguments):
+        limits = {}
+        for index, name in enumerate(arguments[:-1]):
+            if name in ('depth', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo'):
+                limits[name] = int(arguments[index + 1])
+        white = self.board_state.current_player_color == Piece.White
+        clock = limits.get('wtime' if white else 'btime')
+        increment = limits.get('winc' if white else 'binc', 0)
+        movetime = limits.get('movetime')
+        # Any clock makes it a timed game, even one that only gives the opponent's, so only a bare go searches
+        # until stop, like go infinite
+        timed = any(name in limits for name in ('wtime', 'btime', 'winc', 'binc'))
+        infinite = 'infinite' in arguments or (not timed and movetime is None and 'depth' not in limits)
+        if timed and clock is None and movetime is None:
+            movetime = self.default_movetime
+
+        searcher = self.get_searcher()
+        # Deeper would run past the per-ply move buffers of the search
+        searcher.max_depth = max(1, min(limits.get('depth', self.max_depth), MoveOrderer.MAX_PLY - 1))
+        loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        board_state = self.board_state.copy()
+        search = lambda: searcher.search(
+            board_state,
+            movetime=None if movetime is None else movetime / 1000,
+            clock=None if clock is None else clock / 1000,
+            increment=increment / 1000,
+            moves_to_go=limits.get('movestogo'),
+            on_iteration=lambda info: loop.call_soon_threadsafe(self.write, info_line(info)),
+            infinite=infinite,
+        )
+        self.search_task = asyncio.ensure_future(self.search_and_report(search, infinite))
+
+    async def search_and_report(self, search, infinite):
+        score, move = await asyncio.to_thread(search)
+        if infinite:
+            # The protocol only allows bestmove after stop while searching infinitely
+            await self.stop_event.wait()
+        if move is None:
+            move = next(iter(MoveGenerator().get_all_moves(self.board_state, self.board_state.current_player_color)), None)
+        if move is None:
+            self.write("bestmove 0000")
+            return
+        pv = self.searcher.iterations[-1]['pv'] if self.searcher.iterations else []
+        if len(pv) > 1 and pv[0].start == move.start and pv[0].end == move.end:
+            self.write(f"bestmove {move_to_uci(move)} ponder {move_to_uci(pv[1])}")
+        else:
+            self.write(f"bestmove {move_to_uci(move)}")
+
+    async def stop(self):
+        """Stops the running search and waits for its bestmove."""
+        if self.search_task is None:
+            return
+        stopped = not self.search_task.done()
+        if stopped:
+            self.searcher.stop()
+            self.stop_event.set()
+        await self.search_task
+        self.search_task = None
+        if stopped:
+            # The search may have ended on its own just before the stop, which must not carry over to the next one
+            if isinstance(self.searcher, ParallelSearch):
+                self.searcher.stop_flag.value = 0
+            else:
+                self.searcher.stop_requested = False
+
+
+if __name__ == '__main__':
+    asyncio.run(UCIEngine().run())
@@ -0,0 +1,41 @@
+import random
+from piece import Piece
+
+# Fixed seed, keys have to be identical in every process that shares hashes (worker pools, saved tables)
+_random = random.Random(0x2F0B1E57)
+
+PIECE_SQUARE = [[_random.getrandbits(64) for _ in range(64)] for _ in range(Piece.MaxPieceIndex + 1)]
+BLACK_TO_MOVE = _random.getrandbits(64)
+# Indexed by castling_index(has_moved)
+CASTLING = [_random.getrandbits(64) for _ in range(16)]
+EN_PASSANT_FILE = [_random.getrandbits(64) for _ in range(8)]
+
+
+def castling_index(has_moved):
+    """Packs the four castling rights still available (K, Q, k, q) into a 4 bit index."""
+    index = 0
+    if not has_moved['K']:
+        if not has_moved['KR']:
+            index |= 1
+        if not has_moved['QR']:
+            index |= 2
+    if not has_moved['k']:
+        if not has_moved['kr']:
+            index |= 4
+        if not has_moved['qr']:
+            index |= 8
+    return index
+
+
+def compute_hash(board_state):
+    """Hash of board_state computed from scratch, BoardState keeps the same value up to date incrementally."""
+    key = 0
+    for square, piece in enumerate(board_state.board):
+        if piece != Piece.No_Piece:
+            key ^= PIECE_SQUARE[piece][square]
+    if board_state.current_player_color == Piece.Black:
+        key ^= BLACK_TO_MOVE
+    key ^= CASTLING[castling_index(board_state.has_moved)]
+    if board_state.en_passant_square is not None:
+        key ^= EN_PASSANT_FILE[board_state.en_passant_square[1]]
+    return key